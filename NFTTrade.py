@@ -1,24 +1,58 @@
 
 # import python modules
-import os, sys, glob, time, requests, re, traceback, socket, base64
-import subprocess, threading, json, argparse
-import solcx
-from web3 import Web3, middleware
+import os, time, json, argparse
+from concurrent.futures import ThreadPoolExecutor, wait
 #from compile import abi, bytecode
 from os.path import exists
-from pinatapy import PinataPy
 from dotenv import load_dotenv
-from web3.exceptions import ContractLogicError
-from web3.gas_strategies.time_based import *
-from web3.middleware import geth_poa_middleware
-from Crypto.PublicKey import RSA
-from Crypto.Cipher import AES, PKCS1_OAEP
 # import traceback
 
+# web3, solcx, pinatapy and the modules built on them are imported by the
+# methods that need them, so --help, config and metadata commands start fast
 from mainStream import focal
+from solCache import SolCache
+from gasEstimator import GasEstimator
+from ipfsPipeline import PinPipeline
+from ipfsIndex import PinIndex
+from metadataGen import MetadataGenerator
+from queryCache import QueryCache
+from txJournal import TxJournal
+from opExecutor import OpExecutor, Pushback
+from signingPool import SigningPool
 
 class NFTTrade:
 
+    # solc version, resolved once per process
+    solcVersion = None
+
+    # operations of jobs files and the daemon: op -> (method, parameters in call order)
+    operations = {
+        'mint': ('mintNFT', ('address', 'metahash', 'edition')),
+        'mintMany': ('mintBatchNFT', ('address', 'metahash', 'editions')),
+        'addListing': ('addToList', ('address', 'price', 'token_id')),
+        'purchase': ('purchase', ('address', 'edition', 'token_id', 'amount')),
+        'purchaseMany': ('purchaseBatch', ('address', 'editions', 'token_ids', 'amount')),
+        'withdraw': ('withdraw', ('address', 'amount')),
+    }
+
+    # parameters of the operations that are whole numbers, and lists of them
+    intParams = ( 'edition', 'editions', 'price', 'token_id', 'token_ids', 'amount' )
+    listParams = ( 'editions', 'token_ids' )
+
+    # solc settings of the deployed contract, shared with gasReport.py
+    solcSettings = {
+        "optimizer": {
+           "enabled": True
+        },
+        "outputSelection": {
+            "*": {
+                "*": [
+                    "metadata", "evm.bytecode", "abi"
+                ]
+            }
+        }
+    }
+
     # main init function
     def __init__(self):
         load_dotenv()
@@ -34,9 +68,65 @@ class NFTTrade:
         self.pinata_api_key = os.getenv('PINATA_API_KEY')
         # source pinata api secret
         self.pinata_secret_api_key = os.getenv('PINATA_SECRET_KEY')
+        # compiled artifact cache
+        self.solCache = SolCache( '.', os.getenv('SOLC_CACHE_DIR', '.solc-cache') )
+        # base uri per contract address: (uri, time.monotonic() it was read)
+        self.baseUris = {}
+        # seconds a base uri is trusted, another process or the owner's wallet elsewhere may change it
+        self.baseUriTtl = float(os.getenv('BASE_URI_TTL', 60))
+        # JSONL journal of every transaction with its stage timings
+        self.journal = TxJournal.get()
+        # journal entries of prepared transactions by nonce, until they are submitted
+        self.entries = {}
+
+    # shared Web3 session, connects lazily on first use
+    @property
+    def chain( self ):
+        from chainSession import ChainSession
+
+        return ChainSession.get( self.apiUrl )
+
+    # Web3 instance of the shared session
+    @property
+    def web3( self ):
+        return self.chain.web3
+
+    # receipt tracker of the shared session
+    @property
+    def receipts( self ):
+        from receiptTracker import ReceiptTracker
+
+        return ReceiptTracker.get( self.chain )
+
+    # replaces transactions pending for too long with higher fees
+    @property
+    def feeBumper( self ):
+        from feeBumper import FeeBumper
+
+        return FeeBumper.get( self.chain, self.receipts, self.gasOracle )
+
+    # sign a transaction of the wallet: (raw tx, tx hash)
+    def signRaw( self, tfrData ):
+        signed = self.web3.eth.account.signTransaction( tfrData, self.pvtKey )
 
-    # compile solidity file
-    def compileSol( self ):
+        return signed.rawTransaction, signed.hash
+
+    # nonce allocator of the wallet
+    @property
+    def nonces( self ):
+        from nonceManager import NonceManager
+
+        return NonceManager.get( self.web3, self.fromAddr )
+
+    # fee oracle of the shared session
+    @property
+    def gasOracle( self ):
+        from gasOracle import GasOracle
+
+        return GasOracle.get( self.chain )
+
+    # compile solidity file, served from the content-hashed artifact cache when possible
+    def compileSol( self, force = False ):
         # target file path
         source = "contracts/ERC1155.sol"
 
@@ -53,42 +143,63 @@ class NFTTrade:
                         ]
                     }
                 },
-                "settings": {
-                    "optimizer": {
-                       "enabled": True
-                    },
-                    "outputSelection": {
-                        "*": {
-                            "*": [
-                                "metadata", "evm.bytecode", "abi"
-                            ]
-                        }
-                    }
-                }
+                "settings": NFTTrade.solcSettings
             };
 
-        # catch output
-        compileOut = solcx.compile_standard(spec, allow_paths=".")
+        import solcx
+
+        # solc is only asked for its version once per process
+        if NFTTrade.solcVersion is None:
+            NFTTrade.solcVersion = solcx.get_solc_version()
+
+        key = self.solCache.key( source, NFTTrade.solcVersion, spec['settings'] )
+
+        artifact = None if force else self.solCache.load( key )
 
-        # Export contract data into variable
-        abi = compileOut['contracts']['ERC1155.sol']['NFTTrade']['abi']
-        bytecode = compileOut['contracts']['ERC1155.sol']['NFTTrade']['evm']['bytecode']['object']
+        if artifact is None:
+            # catch output
+            compileOut = solcx.compile_standard(spec, allow_paths=".")
 
-        return abi, bytecode
+            # Export contract data into variable
+            artifact = {
+                'abi': compileOut['contracts']['ERC1155.sol']['NFTTrade']['abi'],
+                'bytecode': compileOut['contracts']['ERC1155.sol']['NFTTrade']['evm']['bytecode']['object']
+            }
+
+            path = self.solCache.store( key, artifact )
+            focal.logger.debug("Compiled %s with solc %s, cached at %s", source, NFTTrade.solcVersion, path)
+
+        return artifact['abi'], artifact['bytecode']
 
-    def convertIpfs(self,path):
+    def convertIpfs(self,path, workers = 8, manifest = None):
         filepath = exists(path)
         # exit()
         jsonData=''
         if(filepath):
+            # unchanged or already pinned content is recognised from its locally computed CID
+            from pinatapy import PinataPy
+
             pinata = PinataPy(self.pinata_api_key,self.pinata_secret_api_key)
-            result = pinata.pin_file_to_ipfs(path)
-            jsonData = result.get('IpfsHash') + '/' + os.path.basename(path)
+            index = PinIndex( os.getenv('IPFS_INDEX', '.ipfs-index.json') )
+            pipeline = PinPipeline( pinata, workers, retries=int(os.getenv('PINATA_RETRIES', 5)), index=index )
+
+            if os.path.isdir(path):
+                # directory mode, every file is pinned concurrently into a manifest
+                return pipeline.pinDirectory( path, manifest or 'ipfs-manifest.json' )
+
+            jsonData = pipeline.pinFile( path )
+            index.save()
         else:
             print('path does not exit')
             exit()
         print("Your IPFS hash is: ",jsonData)
 
+    # one metadata document per token id from a CSV/JSONL traits file and a path to CID manifest
+    def generateMetadata(self, traitsPath, cidMap, outDir = None, hexIds = False):
+        generator = MetadataGenerator( cidMap or 'ipfs-manifest.json', outDir or 'metadata', hexIds )
+
+        return generator.generate( traitsPath )
+
     def convertMetadata(self,traitType,Traitvalue,nftDescription, Nftname, jsonData):
         # exit()
         dict={
@@ -107,18 +218,13 @@ class NFTTrade:
             json.dump(dict, fp)
             print('metadata created successfully')
 
-    # deploy contract address
+    # deploy the contract and return its address
     def deployAddress( self, name, symbol ):
         print('deploying...')
-        abi, bytecode = self.compileSol()
+        entry = self.journal.begin( 'deploy', [ name, symbol ] )
 
-        # Web3 ETH provider
-        self.web3 = Web3( provider=Web3.HTTPProvider( self.apiUrl ) )
-        self.web3.middleware_onion.inject(geth_poa_middleware, layer=0)
-
-        self.web3.middleware_onion.add(middleware.time_based_cache_middleware)
-        self.web3.middleware_onion.add(middleware.latest_block_based_cache_middleware)
-        self.web3.middleware_onion.add(middleware.simple_cache_middleware)
+        with entry.stage( 'compile' ):
+            abi, bytecode = self.compileSol()
 
         focal.logger.info(f'Attempting to deploy from account: { self.fromAddr }')
 
@@ -130,281 +236,931 @@ class NFTTrade:
 
         # Build constructor transaction
         
-        constructTxn = NFTTrade.constructor( name, symbol ).buildTransaction(
-            {
-                "gasPrice": self.web3.eth.gas_price,
-                'from': self.fromAddr,
-                'nonce': self.web3.eth.getTransactionCount( self.fromAddr ),
-            }
-        )
+        try:
+            # buildTransaction asks the node for the gas estimate
+            with entry.stage( 'estimate' ):
+                constructTxn = NFTTrade.constructor( name, symbol ).buildTransaction(
+                    {
+                        **self.gasOracle.fees(),
+                        'from': self.fromAddr,
+                        'nonce': self.nonces.allocate(),
+                    }
+                )
+
+            entry.update( nonce=constructTxn['nonce'], gasEstimate=constructTxn['gas'] )
+
+            # Sign transaction with Private Key
+            with entry.stage( 'sign' ):
+                txnCreate = self.web3.eth.account.signTransaction( constructTxn, self.pvtKey )
 
-        # Sign transaction with Private Key
-        txnCreate = self.web3.eth.account.signTransaction( constructTxn, self.pvtKey )
+            # Send transaction and wait for receipt
+            with entry.stage( 'send' ):
+                txnHash = self.sendRaw( txnCreate.rawTransaction, txnCreate.hash )
 
-        # Send transaction and wait for receipt
-        txnHash = self.web3.eth.sendRawTransaction( txnCreate.rawTransaction )
-        txnReceipt = self.web3.eth.waitForTransactionReceipt( txnHash )
+            entry.update( txHash=txnHash )
+
+            future = self.feeBumper.watch( constructTxn, txnHash, self.signRaw, self.sendRaw )
+
+            with entry.stage( 'mined' ):
+                txnReceipt = future.result()
+
+            entry.receipt( txnReceipt )
+            entry.update( contractAddress=txnReceipt.contractAddress, txHash=txnReceipt.transactionHash, hashes=future.hashes )
+        except Exception as e:
+            entry.update( error=str(e) )
+            raise
+        finally:
+            entry.finish()
 
         focal.logger.info(f'Contract deployed at address: { txnReceipt.contractAddress }')
 
+        return txnReceipt.contractAddress
+
     def mintNFT( self, contractAddr, metaDataHash, editionCount ):
-        abi, bytecode = self.compileSol()
+        tfrData, fnName, contractArgs = self.prepareMint( contractAddr, metaDataHash, editionCount )
+
+        return self.submitTxn( tfrData, fnName, contractArgs )
+
+    # build the mint transaction with an allocated nonce, ready to be signed
+    def prepareMint( self, contractAddr, metaDataHash, editionCount, quiet = False ):
+        contractArgs = [ self.fromAddr, editionCount, self.tokenUri( contractAddr, metaDataHash ) ]
+        
+        fnName = "mint"
 
-        # Web3 ETH provider
-        self.web3 = Web3( provider=Web3.HTTPProvider( self.apiUrl ) )
+        return self.prepareTxn( contractAddr, fnName, contractArgs, quiet=quiet ), fnName, contractArgs
 
-        self.web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+    # uri sent with a mint: empty to use the contract's default uri, relative when a base uri is set
+    def tokenUri( self, contractAddr, metaDataHash ):
+        if not metaDataHash:
+            return ""
 
         metaPath = metaDataHash
         separator = '/'
         metaData = metaPath.split(separator, 1)[0]
-       
 
-        contractArgs = [ self.fromAddr, editionCount,  f"ipfs://{metaData}" ]
-        print("Contract Arguments:",contractArgs)
-        
-        fnName = "mint"
+        if self.baseUri( contractAddr ):
+            return metaData
 
-        contract = self.web3.eth.contract( contractAddr, abi=abi )
-     
-        
-        contractData = contract.encodeABI( fnName, args=contractArgs )
-       
-        gas, gasprice, txnFee, nonce = self.calculateMandates( contract, fnName, contractArgs )
-        print('jj')
-        tfrData = {
-            'chainId' : 80001,
-            'to': contract.address,
-            'from': self.fromAddr,
-            'value': Web3.toHex(0),
-            'gasPrice': Web3.toHex(gasprice),
-            'nonce': nonce,
-            'data': contractData,
-            'gas': Web3.toHex(gas),
-        }
+        return f"ipfs://{metaData}"
+
+    # base uri of the contract, read again once it is `baseUriTtl` seconds old
+    def baseUri( self, contractAddr ):
+        cached = self.baseUris.get( contractAddr )
+
+        if cached is None or time.monotonic() - cached[1] > self.baseUriTtl:
+            from web3.exceptions import BadFunctionCallOutput, ContractLogicError
+
+            abi, bytecode = self.compileSol()
+
+            # only a contract without the getter means "no base uri", a failed request raises and is asked again next time
+            try:
+                cached = ( self.chain.contract( contractAddr, abi ).functions.baseURI().call(), time.monotonic() )
+            except ( BadFunctionCallOutput, ContractLogicError ):
+                # deployed before per token uris existed
+                cached = ( "", time.monotonic() )
 
-        focal.logger.info(f"Transaction:\n{tfrData}")
-        focal.logger.info(f"Function: {fnName}")
-        focal.logger.info(f"Arguments:{contractArgs}")
-        focal.logger.info(f"Gas Price:{gasprice}")
-        focal.logger.info(f"Gas:{gas}")
-        focal.logger.info(f"Fees:{txnFee}")
+            self.baseUris[contractAddr] = cached
+
+        return cached[0]
+
+    # owner only: default uri of tokens minted without one, e.g. ipfs://<cid>/{id}.json
+    def setUri( self, contractAddr, uri ):
+        contractArgs = [ uri ]
+
+        fnName = "setURI"
+
+        tfrData = self.prepareTxn( contractAddr, fnName, contractArgs )
+
+        return self.submitTxn( tfrData, fnName, contractArgs )
+
+    # owner only: prefix of per token uris, after which mints send only the metadata hash
+    def setBaseUri( self, contractAddr, baseUri ):
+        contractArgs = [ baseUri ]
+
+        fnName = "setBaseURI"
+
+        tfrData = self.prepareTxn( contractAddr, fnName, contractArgs )
+        txnReceipt = self.submitTxn( tfrData, fnName, contractArgs )
+
+        if txnReceipt and txnReceipt.get('status') == 1:
+            self.baseUris[contractAddr] = ( baseUri, time.monotonic() )
+
+        return txnReceipt
+
+    # build a contract call transaction with gas, fees and an allocated nonce
+    def prepareTxn( self, contractAddr, fnName, contractArgs, value = 0, quiet = False ):
+        from web3 import Web3
+
+        entry = self.journal.begin( fnName, contractArgs )
 
         try:
-            
-            signed = self.web3.eth.account.signTransaction( tfrData, self.pvtKey )
-            txn = self.web3.eth.sendRawTransaction( signed.rawTransaction )
-            
-            txnReceipt = self.web3.eth.waitForTransactionReceipt( txn )
+            with entry.stage( 'compile' ):
+                abi, bytecode = self.compileSol()
 
-            for key in txnReceipt:
-                if key not in ['blockNumber','cumulativeGasUsed','from','contractAddress','status']:
-                    continue
+            contract = self.chain.contract( contractAddr, abi )
 
-                val = txnReceipt.get(key)
-                print(type(val))
-                if( isinstance( val, bytes) ):
-                    val = val.hex()
-                   
-                focal.logger.info(f"{key}: %s ", (val,) )
-        except Exception as e:
-            
-            focal.logger.info(f"{fnName} Error: ", e)
+            contractData = contract.encodeABI( fnName, args=contractArgs )
 
+            with entry.stage( 'estimate' ):
+                gas, fees, txnFee, nonce = self.calculateMandates( contract, fnName, contractArgs )
+        except Exception as e:
+            entry.finish( error=str(e) )
 
-    # to add NFT for Sale
-    def addToList(self,  contractAddr, price,token_id):
-        abi, bytecode = self.compileSol()
-       
-         # Web3 ETH provider
-        wei_amount = price * 10**18
-        
-        self.web3 = Web3( provider=Web3.HTTPProvider( self.apiUrl ) )
+            # nothing was sent yet, the executor may retry it later at a lower rate
+            if Pushback.matches( e ):
+                raise Pushback( str(e) ) from e
 
-        self.web3.middleware_onion.inject(geth_poa_middleware, layer=0)
-        
-        contractArgs = [  contractAddr,wei_amount, token_id]
-        
-        print("Contract Arguments:",contractArgs)
-       
-        fnName = "addListing"
-        
-        contract = self.web3.eth.contract( contractAddr, abi=abi )
-     
-        contractData = contract.encodeABI( fnName, args=contractArgs )
+            raise
 
-        gas, gasprice, txnFee, nonce = self.calculateMandates( contract, fnName, contractArgs )
+        # picked up again by whoever signs the transaction
+        entry.update( address=contract.address, nonce=nonce, gasEstimate=gas )
+        self.entries[nonce] = entry
 
         tfrData = {
-            'chainId' : 80001,
+            'chainId' : self.chain.chainId,
             'to': contract.address,
             'from': self.fromAddr,
-            'value': Web3.toHex(0),
-            'gasPrice': Web3.toHex(gasprice),
+            'value': Web3.toHex(value),
             'nonce': nonce,
             'data': contractData,
             'gas': Web3.toHex(gas),
         }
 
-        focal.logger.info(f"Transaction:\n{tfrData}")
-        focal.logger.info(f"Function: {fnName}")
-        focal.logger.info(f"Arguments:{contractArgs}")
-        focal.logger.info(f"Gas Price:{gasprice}")
-        focal.logger.info(f"Gas:{gas}")
-        focal.logger.info(f"Fees:{txnFee}")
+        # EIP-1559 fee fields, or gasPrice on chains without a base fee
+        for key, fee in fees.items():
+            tfrData[key] = Web3.toHex(fee)
 
-        try:
-            signed = self.web3.eth.account.signTransaction( tfrData, self.pvtKey )
-            txn = self.web3.eth.sendRawTransaction( signed.rawTransaction )
-            txnReceipt = self.web3.eth.waitForTransactionReceipt( txn )
+        # batch runs keep the per transaction detail in the log file only
+        log = focal.logger.debug if quiet else focal.logger.info
 
-            for key in txnReceipt:
-                if key not in ['blockNumber','cumulativeGasUsed','from','contractAddress','status']:
+        # %-style arguments, the transaction dict is only rendered if a handler takes the record
+        log("Transaction:\n%s", tfrData)
+        log("Function: %s", fnName)
+        log("Arguments:%s", contractArgs)
+        log("Fees per gas:%s", fees)
+        log("Gas:%s", gas)
+        log("Fees:%s", txnFee)
+
+        return tfrData
+
+    # mint one token id per edition count in a single transaction
+    def mintBatchNFT( self, contractAddr, metaDataHash, editionCounts ):
+        # either one comma separated hash per edition count or none at all
+        uris = [ self.tokenUri( contractAddr, metaHash ) for metaHash in (metaDataHash or '').split(',') if metaHash ]
+
+        contractArgs = [ self.fromAddr, editionCounts, uris ]
+
+        fnName = "mintBatch"
+
+        tfrData = self.prepareTxn( contractAddr, fnName, contractArgs )
+
+        return self.submitTxn( tfrData, fnName, contractArgs )
+
+    # mint every row of a JSONL manifest with pipelined nonces
+    def mintFromManifest( self, manifest, contractAddr = None, workers = 8, resultPath = None, signedPath = None, signers = None ):
+        resultPath = resultPath or f"{os.path.splitext(manifest)[0]}.results.jsonl"
+
+        rows = []
+        with open( manifest ) as fp:
+            for line in fp:
+                line = line.strip()
+                if line:
+                    rows.append( json.loads(line) )
+
+        focal.logger.info(f"Preparing {len(rows)} mints from {manifest}")
+
+        # prepare everything up front, nonces come out in row order
+        results = []
+        prepared = {}
+        for index, row in enumerate(rows):
+            result = {
+                'row': index,
+                'address': row.get('address') or contractAddr,
+                'metahash': row.get('metahash'),
+                'edition': row.get('edition'),
+            }
+            results.append( result )
+
+            try:
+                tfrData, fnName, contractArgs = self.prepareMint( result['address'], result['metahash'], int(result['edition']), quiet=True )
+                entry = self.entries.pop( tfrData['nonce'] )
+
+                result['nonce'] = tfrData['nonce']
+                result['gasKey'] = ( tfrData['to'], fnName, contractArgs )
+                result['entry'] = entry
+
+                prepared[tfrData['nonce']] = ( result, tfrData )
+            except Exception as e:
+                result['error'] = str(e)
+
+        nonces = self.nonces
+
+        # signing is pure CPU work: spread over worker processes, streamed back in nonce order
+        signedTxns = []
+        # nonces of rows that will never reach the node, filled or handed back once the rest is out
+        gaps = []
+        started = time.monotonic()
+
+        with SigningPool( self.pvtKey, signers ) as signer:
+            for tfrData, rawTxn, txHash, error in signer.sign( [ tfrData for result, tfrData in prepared.values() ] ):
+                result = prepared[tfrData['nonce']][0]
+                result['entry'].mark( 'sign', started )
+
+                if error:
+                    gaps.append( tfrData['nonce'] )
+                    result['error'] = error
+                    result['entry'].finish( error=error )
                     continue
 
-                val = txnReceipt.get(key)
-                print(type(val))
-                if( isinstance( val, bytes) ):
-                    val = val.hex()
+                result['hash'] = txHash
+                signedTxns.append( (result, rawTxn) )
 
-                focal.logger.info(f"{key}: %s ", (val,) )
-        except Exception as e:
-            focal.logger.info(f"{fnName} Error: ", e)
-        
-    def purchase(self, contractAddr, editionCount, token_id, amount):
-        abi, bytecode = self.compileSol()
+        focal.logger.info(f"Signed {len(signedTxns)} of {len(rows)} mints in {time.monotonic() - started:.2f}s")
+
+        # raw transactions go to a file, to be sent later with --broadcast
+        if signedPath:
+            lastNonce = max( (result['nonce'] for result, rawTxn in signedTxns), default=-1 )
+
+            return self.writeSigned( signedTxns, signedPath, self.fillGaps( gaps, prepared, lastNonce, send=False ) )
+
+        def send( item ):
+            result, rawTxn = item
+            entry = result['entry']
+            started = time.monotonic()
+
+            for attempt in range(3):
+                try:
+                    result['txHash'] = self.sendRaw( rawTxn, result['hash'] )
+
+                    entry.mark( 'send', started )
+                    entry.update( txHash=result['txHash'] )
+                    return result
+                except Exception as e:
+                    err = e
+                    if nonces.isStale( e ):
+                        break
+
+            # a nonce used by another transaction is gone; one that never reached the node is filled or handed back below
+            if nonces.isStale( err ):
+                nonces.resync()
+            else:
+                result['gap'] = True
+            result['error'] = str(err)
+            entry.finish( error=str(err) )
+            return result
+
+        def collect( result, future ):
+            entry = result['entry']
+
+            try:
+                receipt = future.result()
+                GasEstimator.get().observe( *result['gasKey'], receipt )
+
+                result['status'] = receipt.get('status')
+                result['blockNumber'] = receipt.get('blockNumber')
+                result['gasUsed'] = receipt.get('gasUsed')
+                entry.receipt( receipt )
+
+                # replaced while pending
+                if len(future.hashes) > 1:
+                    result['txHash'] = receipt.get('transactionHash')
+                    result['hashes'] = future.hashes
+                    entry.update( txHash=result['txHash'], hashes=future.hashes )
+            except Exception as e:
+                result['error'] = str(e)
+                entry.update( error=str(e) )
+
+            entry.finish()
+
+            focal.logger.debug("Row %s nonce %s: %s", result['row'], result['nonce'], result.get('status'))
+
+        with ThreadPoolExecutor( max_workers=workers ) as pool:
+            sent = list( pool.map( send, signedTxns ) )
+
+        focal.logger.info(f"Sent {sum(1 for result in sent if 'txHash' in result)} of {len(rows)} mints, waiting for receipts")
+
+        # later nonces are already out and would wait behind the failed ones until they time out
+        lastNonce = max( (result['nonce'] for result in sent if 'txHash' in result), default=-1 )
+        for result in sent:
+            if result.pop( 'gap', False ):
+                gaps.append( result['nonce'] )
+
+        self.fillGaps( gaps, prepared, lastNonce )
+
+        # every hash is polled by the shared tracker, nothing blocks per transaction; stuck ones get replaced
+        tracked = [ (result, self.feeBumper.watch( prepared[result['nonce']][1], result['txHash'], self.signRaw, self.sendRaw )) for result in sent if 'txHash' in result ]
+
+        # the mined stage ends when the tracker resolves the receipt, not when we get round to collecting it
+        for result, future in tracked:
+            entry = result['entry']
+            future.add_done_callback( lambda future, entry=entry: entry.mark( 'mined', entry.record['stages']['send'][1] ) )
+        for result, future in tracked:
+            collect( result, future )
+
+        with open( resultPath, 'w' ) as fp:
+            for result in results:
+                result.pop( 'gasKey', None )
+                result.pop( 'entry', None )
+                fp.write( json.dumps(result) )
+                fp.write( "\n" )
+
+        minted = sum( 1 for result in results if result.get('status') == 1 )
+        focal.logger.info(f"Minted {minted} of {len(rows)} rows, results written to {resultPath}")
+
+        return results
+
+    # zero value transfer to the wallet itself with the nonce and fees of `tfrData`
+    def noopTxn( self, tfrData ):
+        noop = { key: tfrData[key] for key in ( 'chainId', 'nonce', 'maxFeePerGas', 'maxPriorityFeePerGas', 'gasPrice' ) if key in tfrData }
+        noop.update( to=self.fromAddr, value=0, gas=21000, data='0x' )
+
+        return noop
+
+    # no-ops at the `gaps` nonces below `lastNonce`, so the transactions after them are not stuck; higher ones are handed back
+    # returns [(nonce, raw tx, tx hash)], sent unless `send` is false
+    def fillGaps( self, gaps, prepared, lastNonce, send = True ):
+        nonces = self.nonces
+        filled = []
+
+        for nonce in sorted( gaps ):
+            if nonce > lastNonce:
+                nonces.release( nonce )
+                continue
+
+            result, tfrData = prepared[nonce]
+            noop = self.noopTxn( tfrData )
+
+            try:
+                rawTxn, txHash = self.signRaw( noop )
+                txHash = self.sendRaw( rawTxn, txHash ) if send else txHash.hex()
+            except Exception as e:
+                if nonces.isStale( e ):
+                    continue
+
+                focal.logger.warning("Nonce %s could not be filled, later rows wait for it: %s", nonce, e)
+                nonces.release( nonce )
+                continue
+
+            if send:
+                self.feeBumper.watch( noop, txHash, self.signRaw, self.sendRaw )
+
+            result['noopHash'] = txHash
+            filled.append( (nonce, rawTxn.hex(), txHash) )
+
+        if filled:
+            focal.logger.info(f"Filled {len(filled)} nonces of failed rows with no-op transactions")
+
+        return filled
+
+    # no-ops at nonces handed back by failed sends and not reused for `idle` seconds, while later nonces are already out
+    def fillReleased( self, idle ):
+        from web3 import Web3
+
+        gaps = self.nonces.takeIdle( idle )
+        if not gaps:
+            return []
+
+        fees = { key: Web3.toHex(fee) for key, fee in self.gasOracle.fees().items() }
+        prepared = { nonce: ( {}, { 'chainId': self.chain.chainId, 'nonce': nonce, **fees } ) for nonce in gaps }
+
+        return self.fillGaps( gaps, prepared, max(gaps) )
+
+    # JSONL file of signed raw transactions in nonce order, written atomically; `fillers` are (nonce, raw tx, tx hash) no-ops
+    def writeSigned( self, signedTxns, signedPath, fillers = () ):
+        tmpPath = f"{signedPath}.{os.getpid()}.tmp"
+
+        with open( tmpPath, 'w' ) as fp:
+            for nonce, rawTxn, txHash in fillers:
+                fp.write( json.dumps({ 'nonce': nonce, 'hash': txHash, 'op': 'noop', 'args': [], 'to': self.fromAddr, 'raw': rawTxn }) )
+                fp.write( "\n" )
+
+            for result, rawTxn in signedTxns:
+                entry = result.pop( 'entry' )
+                to, fnName, contractArgs = result.pop( 'gasKey' )
+
+                entry.finish( signed=signedPath )
+
+                fp.write( json.dumps({ **result, 'op': fnName, 'args': contractArgs, 'to': to, 'raw': rawTxn }) )
+                fp.write( "\n" )
+
+        os.replace( tmpPath, signedPath )
+
+        focal.logger.info(f"{len(signedTxns)} signed transactions written to {signedPath}, send them with --broadcast before any other transaction of {self.fromAddr}")
+
+        return signedTxns
+
+    # send raw transactions signed earlier with --sign-only, in nonce order and batched JSON-RPC requests
+    def broadcast( self, signedPath, resultPath = None, batchSize = 100 ):
+        resultPath = resultPath or f"{os.path.splitext(signedPath)[0]}.results.jsonl"
+
+        records = []
+        with open( signedPath ) as fp:
+            for line in fp:
+                line = line.strip()
+                if line:
+                    records.append( json.loads(line) )
+
+        records.sort( key=lambda record: record['nonce'] )
+
+        tracked = []
+        for start in range( 0, len(records), batchSize ):
+            batch = records[start:start + batchSize]
+            sentAt = time.monotonic()
+
+            replies = self.chain.rpcBatch([ ('eth_sendRawTransaction', [ record['raw'] ]) for record in batch ])
+
+            for record, reply in zip( batch, replies ):
+                record.pop( 'raw' )
+                entry = self.journal.begin( record.get('op', 'broadcast'), record.get('args', []) )
+                entry.mark( 'send', sentAt )
+                entry.update( nonce=record['nonce'], txHash=record['hash'] )
+
+                # a node that already has the transaction still mines it
+                if isinstance( reply, Exception ) and not self.nonces.isKnown( reply ):
+                    record['error'] = str(reply)
+                    entry.finish( error=str(reply) )
+                    continue
+
+                future = self.receipts.track( record['hash'] )
+                future.add_done_callback( lambda future, entry=entry: entry.mark( 'mined', entry.record['stages']['send'][1] ) )
+                tracked.append( (record, entry, future) )
+
+        focal.logger.info(f"Broadcast {len(tracked)} of {len(records)} transactions, waiting for receipts")
+
+        for record, entry, future in tracked:
+            try:
+                receipt = future.result()
+
+                record['status'] = receipt.get('status')
+                record['blockNumber'] = receipt.get('blockNumber')
+                record['gasUsed'] = receipt.get('gasUsed')
+                entry.receipt( receipt )
+            except Exception as e:
+                record['error'] = str(e)
+                entry.update( error=str(e) )
+
+            entry.finish()
+
+        with open( resultPath, 'w' ) as fp:
+            for record in records:
+                fp.write( json.dumps(record, default=str) )
+                fp.write( "\n" )
+
+        mined = sum( 1 for record in records if record.get('status') == 1 )
+        focal.logger.info(f"{mined} of {len(records)} transactions succeeded, results written to {resultPath}")
+
+        return records
+
+    # to add NFT for Sale
+    def addToList(self,  contractAddr, price,token_id):
+        wei_amount = price * 10**18
         
-         # Web3 ETH provider
-        self.web3 = Web3( provider=Web3.HTTPProvider( self.apiUrl ) )
+        contractArgs = [  contractAddr,wei_amount, token_id]
+       
+        fnName = "addListing"
+
+        tfrData = self.prepareTxn( contractAddr, fnName, contractArgs )
 
-        self.web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+        return self.submitTxn( tfrData, fnName, contractArgs )
         
+    def purchase(self, contractAddr, editionCount, token_id, amount):
         wei_amount = amount * 10**18
         
         contractArgs = [ contractAddr,editionCount, token_id, wei_amount]
-        print("Contract Arguments",contractArgs)
         
         fnName = "purchase"
-        
-        contract = self.web3.eth.contract( contractAddr, abi=abi )
-     
-        contractData = contract.encodeABI( fnName, args=contractArgs )
 
-        gas, gasprice, txnFee, nonce = self.calculateMandates( contract, fnName, contractArgs )
+        tfrData = self.prepareTxn( contractAddr, fnName, contractArgs, value=wei_amount )
 
-        tfrData = {
-            'chainId' : 80001,
-            'to': contract.address,
-            'from': self.fromAddr,
-            'value': Web3.toHex(wei_amount),
-            'gasPrice': Web3.toHex(gasprice),
-            'nonce': nonce,
-            'data': contractData,
-            'gas': Web3.toHex(gas),
-        }
-
-        focal.logger.info(f"Transaction:\n{tfrData}")
-        focal.logger.info(f"Function: {fnName}")
-        focal.logger.info(f"Arguments:{contractArgs}")
-        focal.logger.info(f"Gas Price:{gasprice}")
-        focal.logger.info(f"Gas:{gas}")
-        focal.logger.info(f"Fees:{txnFee}")
+        return self.submitTxn( tfrData, fnName, contractArgs )
 
-        try:
-            signed = self.web3.eth.account.signTransaction( tfrData, self.pvtKey )
-            txn = self.web3.eth.sendRawTransaction( signed.rawTransaction )
-            txnReceipt = self.web3.eth.waitForTransactionReceipt( txn )
+    # buy several listed token ids of one seller in a single transaction
+    def purchaseBatch(self, contractAddr, editionCounts, token_ids, amount):
+        wei_amount = amount * 10**18
 
-            for key in txnReceipt:
-                if key not in ['blockNumber','cumulativeGasUsed','from','contractAddress','status']:
-                    continue
+        contractArgs = [ contractAddr, editionCounts, token_ids, wei_amount ]
 
-                val = txnReceipt.get(key)
-                print(type(val))
-                if( isinstance( val, bytes) ):
-                    val = val.hex()
+        fnName = "purchaseBatch"
 
-                focal.logger.info(f"{key}: %s ", (val,) )
-        except Exception as e:
-            focal.logger.info(f"{fnName} Error: ", e)
+        tfrData = self.prepareTxn( contractAddr, fnName, contractArgs, value=wei_amount )
 
+        return self.submitTxn( tfrData, fnName, contractArgs )
 
     def withdraw(self, contractAddr, amount):
-        abi, bytecode = self.compileSol()
-        print('kkk')
-         # Web3 ETH provider
-        self.web3 = Web3( provider=Web3.HTTPProvider( self.apiUrl ) )
-
-        self.web3.middleware_onion.inject(geth_poa_middleware, layer=0)
-        
         wei_amount = amount * 10**18
         
         contractArgs = [wei_amount]
-        print("Contract arguments :", contractArgs)
         
         fnName = "withdraw"
 
-        contract = self.web3.eth.contract( contractAddr, abi=abi )
-     
-        contractData = contract.encodeABI( fnName, args=contractArgs )
+        tfrData = self.prepareTxn( contractAddr, fnName, contractArgs )
 
-        gas, gasprice, txnFee, nonce = self.calculateMandates( contract, fnName, contractArgs )
+        return self.submitTxn( tfrData, fnName, contractArgs )
         
-        tfrData = {
-            'chainId' : 80001,
-            'to': contract.address,
-            'from': self.fromAddr,
-            'value': Web3.toHex(0),
-            'gasPrice': Web3.toHex(gasprice),
-            'nonce': nonce,
-            'data': contractData,
-            'gas': Web3.toHex(gas),
+    # read-only contract calls through the block / event invalidated cache, batched in one request
+    def query( self, contractAddr, calls ):
+        abi, bytecode = self.compileSol()
+
+        contract = self.chain.contract( contractAddr, abi )
+        cache = QueryCache( self.chain, os.getenv('QUERY_CACHE', '.query-cache.json') )
+
+        results = cache.query( contract, calls )
+
+        for (fnName, args), result in zip( calls, results ):
+            print(json.dumps({ 'call': fnName, 'args': list(args), 'result': result }))
+
+        return results
+
+    # local event index of a contract
+    def indexer( self, contractAddr ):
+        from eventIndexer import EventIndexer
+
+        abi, bytecode = self.compileSol()
+
+        return EventIndexer(
+            self.web3,
+            self.chain.contract( contractAddr, abi ),
+            dbPath = os.getenv('INDEX_DB', 'nft-index.db'),
+            confirmations = int(os.getenv('INDEX_CONFIRMATIONS', 5))
+        )
+
+    # pull contract logs into the local database, once or continuously
+    def indexEvents( self, contractAddr, fromBlock = 0, follow = False ):
+        indexer = self.indexer( contractAddr )
+
+        while True:
+            block, blockHash = indexer.sync( fromBlock or 0 ) or (None, None)
+            focal.logger.info(f"Index of {contractAddr} is at block {block}")
+
+            if not follow:
+                return block
+
+            time.sleep( float(os.getenv('INDEX_POLL_INTERVAL', 5)) )
+
+    # listings served from the local index
+    def showListings( self, contractAddr ):
+        listings = self.indexer( contractAddr ).listings()
+
+        for listing in listings:
+            print(json.dumps(listing))
+
+        return listings
+
+    # balances of `owner` served from the local index
+    def showPortfolio( self, contractAddr, owner ):
+        portfolio = self.indexer( contractAddr ).portfolio( owner or self.fromAddr )
+
+        print(json.dumps(portfolio))
+
+        return portfolio
+
+    # bound method and arguments of `op` from a parameter dict; KeyError if either is wrong
+    def operation( self, op, params ):
+        if op not in self.operations:
+            raise KeyError(f"unknown operation '{op}', expected one of {', '.join(self.operations)}")
+
+        method, names = self.operations[op]
+
+        # metahash may be left out to mint without a uri
+        missing = [ name for name in names if name not in params and name != 'metahash' ]
+        if missing:
+            raise KeyError(f"missing parameters: {', '.join(missing)}")
+
+        # counts, ids and ether amounts are scaled to wei as they are: a float or string would not survive the encoding
+        for name in names:
+            values = params.get(name) if name in self.listParams else [ params.get(name) ]
+
+            if name in self.intParams and ( not isinstance( values, list ) or not all( isinstance( value, int ) and not isinstance( value, bool ) and value >= 0 for value in values ) ):
+                raise ValueError(f"{name} must be a non-negative integer{' list' if name in self.listParams else ''}")
+
+        return getattr( self, method ), [ params.get(name) for name in names ]
+
+    # concurrent executor capped per wallet and per RPC endpoint
+    def executor( self, workers = 8, maxPending = None ):
+        return OpExecutor(
+            workers,
+            perWallet = int(os.getenv('EXEC_WALLET_INFLIGHT', 16)),
+            perEndpoint = int(os.getenv('EXEC_ENDPOINT_INFLIGHT', 32)),
+            maxPending = maxPending or int(os.getenv('EXEC_MAX_PENDING', 1000)),
+            retries = int(os.getenv('EXEC_RETRIES', 5))
+        )
+
+    # run every line of a JSONL jobs file concurrently, e.g. {"op": "purchase", "address": ..., "edition": 1, "token_id": 3, "amount": 1}
+    # purchase rows go through `buyer` when given, another NFTTrade instance
+    def runJobs( self, jobsPath, workers = 8, resultPath = None, buyer = None ):
+        resultPath = resultPath or f"{os.path.splitext(jobsPath)[0]}.results.jsonl"
+        executor = self.executor( workers )
+
+        results = []
+        pending = []
+
+        with open( jobsPath ) as fp:
+            for index, line in enumerate(fp):
+                line = line.strip()
+                if not line:
+                    continue
+
+                params = json.loads( line )
+                result = { 'row': index, 'op': params.get('op') }
+                results.append( result )
+
+                trade = buyer if buyer and params.get('op') in ('purchase', 'purchaseMany') else self
+
+                try:
+                    func, args = trade.operation( params.get('op'), params )
+                except KeyError as e:
+                    result['error'] = e.args[0]
+                    continue
+                except ValueError as e:
+                    result['error'] = str(e)
+                    continue
+
+                # blocks while the executor is full, so a huge file is not read into the queue at once
+                pending.append( (result, executor.submit( func, args, trade.fromAddr, trade.chain.endpoint )) )
+
+        # a send failing while later nonces are out leaves a gap only a later job could reuse; past the last job nothing does
+        idle = float(os.getenv('NONCE_GAP_FILL_AFTER', 5))
+        waiting = { future for result, future in pending }
+
+        while waiting:
+            done, waiting = wait( waiting, timeout=idle )
+
+            for trade in ( self, buyer ) if buyer else ( self, ):
+                try:
+                    trade.fillReleased( idle )
+                except Exception as e:
+                    focal.logger.warning("Nonce gaps of %s not filled: %s", trade.fromAddr, e)
+
+        for result, future in pending:
+            try:
+                receipt = future.result()
+
+                if receipt:
+                    result['status'] = receipt.get('status')
+                    result['txHash'] = receipt.get('transactionHash')
+                    result['gasUsed'] = receipt.get('gasUsed')
+                else:
+                    result['error'] = 'transaction was not sent, see the log'
+            except Exception as e:
+                result['error'] = str(e)
+
+        executor.shutdown()
+
+        with open( resultPath, 'w' ) as fp:
+            for result in results:
+                fp.write( json.dumps(result) )
+                fp.write( "\n" )
+
+        done = sum( 1 for result in results if result.get('status') == 1 )
+        focal.logger.info(f"{done} of {len(results)} jobs succeeded, results written to {resultPath}")
+
+        return results
+
+    # new instance on `apiUrl` with a throwaway wallet funded by the dev chain, outside the real journal
+    @classmethod
+    def sandbox( cls, apiUrl ):
+        from eth_account import Account
+
+        trade = cls()
+        account = Account.create()
+
+        trade.apiUrl = apiUrl
+        trade.fromAddr, trade.pvtKey = account.address, account.key.hex()
+        trade.journal = TxJournal( 'off' )
+        trade.chain.fund( trade.fromAddr )
+
+        return trade
+
+    # dry run of a mint manifest or jobs file on a fresh deployment in a local EVM: gas and revert outcome per row
+    # runs on its own seller and buyer wallets, this instance and the real key are left alone
+    def simulate( self, manifest, url = None, workers = 8, resultPath = None ):
+        import tempfile
+        from chainSession import ChainSession
+
+        resultPath = resultPath or f"{os.path.splitext(manifest)[0]}.simulation.jsonl"
+
+        # never API_URL: the in-process EVM, or the local node given with -u
+        seller = self.sandbox( url or ChainSession.inProcess )
+        # purchase rows come from another wallet, the contract refuses to sell a seller its own tokens
+        buyer = self.sandbox( seller.apiUrl )
+
+        # blocks are mined as soon as a transaction arrives
+        if 'RECEIPT_POLL_INTERVAL' not in os.environ:
+            seller.receipts.pollInterval = 0.1
+
+        started = time.monotonic()
+        address = seller.deployAddress( 'Simulation', 'SIM' )
+
+        rows = []
+        with open( manifest ) as fp:
+            for line in fp:
+                line = line.strip()
+                if line:
+                    rows.append( json.loads(line) )
+
+        # every row targets the local deployment; plain mint manifests take the pipelined --mint-batch path
+        with tempfile.NamedTemporaryFile( 'w', suffix='.jsonl', delete=False ) as fp:
+            for row in rows:
+                fp.write( json.dumps({ **row, 'address': address }) )
+                fp.write( "\n" )
+
+        try:
+            if all( row.get('op', 'mint') == 'mint' for row in rows ):
+                results = seller.mintFromManifest( fp.name, address, workers, resultPath )
+            else:
+                results = seller.runJobs( fp.name, workers, resultPath, buyer )
+        finally:
+            os.unlink( fp.name )
+
+        summary = {
+            'chainId': seller.chain.chainId,
+            'contract': address,
+            'rows': len(results),
+            'succeeded': 0,
+            'reverted': 0,
+            'failed': 0,
+            'gasUsed': 0,
+            'gasPerOp': {},
         }
-        
-        focal.logger.info(f"Transaction:\n{tfrData}")
-        focal.logger.info(f"Function: {fnName}")
-        focal.logger.info(f"Arguments:{contractArgs}")
-        focal.logger.info(f"Gas Price:{gasprice}")
-        focal.logger.info(f"Gas:{gas}")
-        focal.logger.info(f"Fees:{txnFee}")
+
+        gasByOp = {}
+        for row, result in zip( rows, results ):
+            error = result.get('error') or ''
+
+            if result.get('status') == 1:
+                summary['succeeded'] += 1
+                summary['gasUsed'] += result['gasUsed']
+                gasByOp.setdefault( row.get('op', 'mint'), [] ).append( result['gasUsed'] )
+            elif result.get('status') == 0 or 'revert' in error.lower():
+                summary['reverted'] += 1
+            else:
+                summary['failed'] += 1
+
+        for op, gas in gasByOp.items():
+            summary['gasPerOp'][op] = { 'count': len(gas), 'mean': round(sum(gas) / len(gas)), 'max': max(gas) }
+
+        summary['seconds'] = round( time.monotonic() - started, 2 )
+
+        focal.logger.info(f"Simulated {len(results)} rows in {summary['seconds']}s: {summary['succeeded']} succeeded, {summary['reverted']} reverted, {summary['failed']} failed, results written to {resultPath}")
+
+        print( json.dumps(summary, indent=2) )
+
+        return summary
+
+    # stay resident and take mint / list / purchase / withdraw requests over HTTP or a unix socket
+    def serve( self, port = None, socketPath = None, workers = 8 ):
+        from nftDaemon import NFTDaemon
+
+        daemon = NFTDaemon( self, self.executor( workers, int(os.getenv('DAEMON_MAX_QUEUED', 10000)) ), os.getenv('DAEMON_TOKEN'), fillAfter = float(os.getenv('NONCE_GAP_FILL_AFTER', 5)) )
+
+        daemon.serve( os.getenv('DAEMON_HOST', '127.0.0.1'), port or int(os.getenv('DAEMON_PORT', 8645)), socketPath )
+
+    # p50 / p95 latency per operation and pipeline stage of a transaction journal
+    def journalReport( self, path = None ):
+        summary = TxJournal.report( path or self.journal.path )
+
+        print(f"{'op':<16}{'stage':<10}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'max ms':>12}")
+
+        for op, opStages in summary.items():
+            for stage, row in opStages.items():
+                print(f"{op:<16}{stage:<10}{row['count']:>8}{row['p50']:>12}{row['p95']:>12}{row['max']:>12}")
+
+        return summary
+
+    # send a signed transaction, returns its hex hash; a node that already has it (a retried or failed over send) counts as sent
+    # so does a send that failed after it may have reached the node: the receipt tracker looks for it, the fee bumper re-sends it
+    def sendRaw( self, rawTxn, txHash ):
+        from rpcProvider import maybeDelivered
+
+        txHash = txHash if isinstance( txHash, str ) else txHash.hex()
+
+        try:
+            return self.web3.eth.sendRawTransaction( rawTxn ).hex()
+        except Exception as e:
+            if maybeDelivered( e ):
+                focal.logger.warning("Send of %s failed after it may have reached the node, waiting for it: %s", txHash, e)
+
+                return txHash
+
+            if not self.nonces.isKnown( e ):
+                raise
+
+            focal.logger.debug("Transaction %s already known to the node", txHash)
+
+            return txHash
+
+    # sign, send and wait for a prepared transaction, handing the nonce back if the node rejects it
+    def submitTxn( self, tfrData, fnName, contractArgs = () ):
+        nonces = self.nonces
+        entry = self.entries.pop( tfrData['nonce'], None ) or self.journal.begin( fnName, contractArgs )
+
+        try:
+            with entry.stage( 'sign' ):
+                signed = self.web3.eth.account.signTransaction( tfrData, self.pvtKey )
+
+            with entry.stage( 'send' ):
+                txn = self.sendRaw( signed.rawTransaction, signed.hash )
+        except Exception as e:
+            # a nonce taken by another transaction is gone, any other is handed back
+            if nonces.isStale( e ):
+                nonces.resync()
+            else:
+                nonces.release( tfrData['nonce'] )
+
+            focal.logger.error("%s Error: %s", fnName, e)
+            entry.finish( error=str(e) )
+
+            # overloaded node or provider that refused the transaction, the executor retries it later at a lower rate
+            if Pushback.matches( e ):
+                raise Pushback( str(e) ) from e
+
+            return None
+
+        entry.update( txHash=txn )
 
         try:
-            signed = self.web3.eth.account.signTransaction( tfrData, self.pvtKey )
-            txn = self.web3.eth.sendRawTransaction( signed.rawTransaction )
-            txnReceipt = self.web3.eth.waitForTransactionReceipt( txn )
+            future = self.feeBumper.watch( tfrData, txn, self.signRaw, self.sendRaw )
+
+            with entry.stage( 'mined' ):
+                txnReceipt = future.result()
+
+            entry.receipt( txnReceipt )
+
+            # replaced while pending
+            if len(future.hashes) > 1:
+                entry.update( txHash=txnReceipt.get('transactionHash'), hashes=future.hashes )
+
+            GasEstimator.get().observe( tfrData['to'], fnName, contractArgs, txnReceipt )
 
             for key in txnReceipt:
                 if key not in ['blockNumber','cumulativeGasUsed','from','contractAddress','status']:
                     continue
 
                 val = txnReceipt.get(key)
-                print(type(val))
                 if( isinstance( val, bytes) ):
                     val = val.hex()
 
-                focal.logger.info(f"{key}: %s ", (val,) )
+                focal.logger.info("%s: %s ", key, val)
+
+            return txnReceipt
         except Exception as e:
-            focal.logger.info(f"{fnName} Error: ", e)
-        
+            focal.logger.error("%s Error: %s", fnName, e)
+            entry.update( error=str(e) )
+        finally:
+            entry.finish()
+
+        return None
+
     def calculateMandates( self, contract, fnName, contractArgs ):
 
+        from web3 import Web3
+
         # calculate gas & transaction fees
         csAddr = Web3.toChecksumAddress( self.fromAddr )
 
-        strategy = construct_time_based_gas_price_strategy( 10 )
+        # learned per contract function, the node is only asked on a miss or after a revert
+        gas = GasEstimator.get().estimate( contract, fnName, contractArgs, csAddr )
+
+        # served from the per block cache of the gas oracle
+        fees = self.gasOracle.fees()
 
-        self.web3.eth.setGasPriceStrategy( strategy )
+        txnFee = gas * self.gasOracle.maxPrice( fees )
 
-        gas = getattr( contract.functions, fnName )(*contractArgs).estimateGas({'from': csAddr})
+        # allocated locally, the node is only asked for the pending count once per wallet
+        nonce = self.nonces.allocate()
 
-        gasprice = self.web3.eth.generateGasPrice()
+        return gas, fees, txnFee, nonce
+#---------------------------------------
+# Parse comma separated integers
+#---------------------------------------
+def intList(value):
+    return [ int(item) for item in value.split(',') if item.strip() ]
+
+#---------------------------------------
+# Contract reads requested on the command line
+#---------------------------------------
+def queryCalls(args, wallet):
+    tokenIds = args['token_ids'] or ([ args['token_id'] ] if args['token_id'] is not None else [])
+    calls = []
 
-        txnFee = gas * gasprice
+    if args['getListing'] or args['balanceOf']:
+        from web3 import Web3
 
-        # calculate fees
-        nonce = Web3.toHex( self.web3.eth.getTransactionCount(csAddr) )
+    if args['getListing']:
+        calls += [ ('listings', [ Web3.toChecksumAddress( args['address'] ), tokenId ]) for tokenId in tokenIds ]
+
+    if args['balanceOf']:
+        owner = Web3.toChecksumAddress( args['balanceOf'] if isinstance( args['balanceOf'], str ) else wallet )
+        calls += [ ('balanceOf', [ owner, tokenId ]) for tokenId in tokenIds ]
+
+    if args['totalSupply']:
+        calls += [ ('totalSupply', [ tokenId ]) for tokenId in tokenIds ]
+
+    if args['contractBalance']:
+        calls.append( ('getBalance', []) )
+
+    return calls
 
-        return gas, gasprice, txnFee, nonce
 #---------------------------------------
 # Setup arguments to execute
 #---------------------------------------
@@ -426,32 +1182,68 @@ def initOptions():
     parser.version = '1.0'
 
     # Add the arguments
-    parser.add_argument('-c', '--compile', nargs='?', const=True, type=bool, help='For compile the solidity')
+    parser.add_argument('-c', '--compile', nargs='?', const=True, type=bool, help='For compile the solidity and pre-warm the artifact cache')
+    parser.add_argument('-rb', '--rebuild', nargs='?', const=True, type=bool, help='Ignore the cached artifact and recompile')
     parser.add_argument('-d', '--deploy', nargs='?', const=True, type=bool, help='For deploy contract address')
     parser.add_argument('-ip', '--ipfs', nargs='?', const=True, type=bool, help='For converting our digital asset into ipfs hash')
     parser.add_argument('-md','--metadata',nargs='?',const=True, type=bool, help='For converting our digital asset into metadata')
-    parser.add_argument('-path', '--path', type=str, help='For path of digital asset')
+    parser.add_argument('-path', '--path', type=str, help='For path of digital asset, or a directory of assets to pin concurrently')
+    parser.add_argument('-mf', '--manifest', type=str, help='For path of the path to IPFS hash manifest written in directory mode')
     parser.add_argument('-tt', '--traitType', type=str, help='For name of the deployment group')
     parser.add_argument('-val', '--Traitvalue', type=str, help='For trait type of the metadata')
     parser.add_argument('-ds', '--nftDescription', type=str, help='For description of the metadata')
     parser.add_argument('-jd', '--jsonData', type=str, help='For jsonData of the metadata')
     parser.add_argument('-nm', '--Nftname', type=str, help='For name of metadata')
+    parser.add_argument('-tr', '--traits', type=str, help='For CSV/JSONL traits file, creates one metadata file per token id')
+    parser.add_argument('-od', '--outDir', type=str, help='For directory of the generated metadata files')
+    parser.add_argument('-hx', '--hexIds', nargs='?', const=True, type=bool, help='For naming metadata files by the 64 digit hex token id the {id} uri template expects')
     
     parser.add_argument('-m', '--mint', nargs='?', const=True, type=bool, help='For Minting the NFT')
+    parser.add_argument('-mm', '--mintMany', nargs='?', const=True, type=bool, help='For Minting one token id per edition count in a single transaction')
+    parser.add_argument('-es', '--editions', type=intList, help='For comma separated edition counts, e.g. 10,5,1')
+    parser.add_argument('-mb', '--mint-batch', dest='mintBatch', type=str, help='For Minting every row of a JSONL manifest of address, metahash, edition')
+    parser.add_argument('-so', '--sign-only', dest='signOnly', type=str, help='For writing the signed --mint-batch transactions to this file instead of sending them')
+    parser.add_argument('-bc', '--broadcast', type=str, help='For sending a file of transactions signed with --sign-only')
+    parser.add_argument('-sw', '--signers', type=int, help='For number of signing processes in batch modes (default: CPU count)')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='For number of concurrent senders in batch modes')
+    parser.add_argument('-rs', '--results', type=str, help='For path of the per-row result file of batch modes')
     parser.add_argument('-n', '--name', type=str, help='For name of the deployment group')
     parser.add_argument('-s', '--symbol', type=str, help='For symbol of the deployment group')
     parser.add_argument('-a', '--address', type=str, help='For address of the contract')
     parser.add_argument('-e', '--edition', type=int, help='For edition count of the nft')
     parser.add_argument('-mh', '--metahash', type=str, help='For meta hash of the contract')
-    parser.add_argument('-u', '--url', type=str, help='For API url of the blockchain')
+    parser.add_argument('-u', '--url', type=str, help='For API url of the blockchain, overrides API_URL (eth-tester for the in-process EVM)')
     
+    parser.add_argument('-su', '--setUri', type=str, help='For setting the default token uri of the contract, e.g. ipfs://<cid>/{id}.json')
+    parser.add_argument('-sb', '--setBaseUri', type=str, help='For setting the prefix of per token uris, e.g. ipfs://')
+
     parser.add_argument('-al', '--addListing', nargs='?', const=True, type=bool, help='For Listing NFT for sale')
     parser.add_argument('-pr', '--price', type=int, help='to set the price of the nft') 
     parser.add_argument('-tid', '--token_id', type=int, help='to set the token id of the NFT')
     
     parser.add_argument('-pur', '--purchase', nargs='?', const=True, type=bool, help='For purchasing NFT for sale')
+    parser.add_argument('-pm', '--purchaseMany', nargs='?', const=True, type=bool, help='For purchasing several NFTs of one seller in a single transaction')
+    parser.add_argument('-tids', '--token_ids', type=intList, help='For comma separated token ids, e.g. 1,2,3')
     # parser.add_argument('-ec', '--editionCount', type=str, help='For edition count of NFT')
     
+    parser.add_argument('-ix', '--index', nargs='?', const=True, type=bool, help='For indexing contract events into the local database')
+    parser.add_argument('-fb', '--fromBlock', type=int, help='For first block to index when there is no checkpoint yet')
+    parser.add_argument('-fl', '--follow', nargs='?', const=True, type=bool, help='For keep indexing new blocks')
+    parser.add_argument('-ls', '--listings', nargs='?', const=True, type=bool, help='For showing listings from the local index')
+    parser.add_argument('-pf', '--portfolio', nargs='?', const=True, type=str, help='For showing balances of an owner (default: wallet) from the local index')
+
+    parser.add_argument('-gl', '--getListing', nargs='?', const=True, type=bool, help='For reading the listing of -tid/-tids')
+    parser.add_argument('-bo', '--balanceOf', nargs='?', const=True, type=str, help='For reading the balance of an owner (default: wallet) for -tid/-tids')
+    parser.add_argument('-ts', '--totalSupply', nargs='?', const=True, type=bool, help='For reading the total supply of -tid/-tids')
+    parser.add_argument('-cb', '--contractBalance', nargs='?', const=True, type=bool, help='For reading the balance reported by getBalance')
+
+    parser.add_argument('-sv', '--serve', nargs='?', const=True, type=bool, help='For running as a daemon taking requests over HTTP or a unix socket')
+    parser.add_argument('-po', '--port', type=int, help='For HTTP port of the daemon (default: DAEMON_PORT or 8645)')
+    parser.add_argument('-sk', '--socket', type=str, help='For unix socket path of the daemon, instead of HTTP')
+    parser.add_argument('-jb', '--jobs', type=str, help='For JSONL file of independent operations to run concurrently, one {"op": ..., params} per line')
+    parser.add_argument('-sim', '--simulate', type=str, help='For dry run of a mint manifest or jobs file on a fresh deployment in the in-process EVM or the local node of -u')
+    parser.add_argument('-jr', '--journalReport', nargs='?', const=True, type=str, help='For p50/p95 latency per stage of the transaction journal (default: TX_JOURNAL)')
+
     parser.add_argument('-wd', '--withdraw', nargs='?', const=True, type=bool, help='For withdrawing NFT for sale')
     parser.add_argument('-amt', '--amount', type=int, help='For edition count of the nft')
 
@@ -475,10 +1267,23 @@ def main():
                   "ipfs" : mintNFT.convertIpfs,
                   "deploy" : mintNFT.deployAddress,
                   "mint" : mintNFT.mintNFT,
+                  "mintBatch" : mintNFT.mintFromManifest,
+                  "mintMany" : mintNFT.mintBatchNFT,
                   "metadata" : mintNFT.convertMetadata,
+                  "setUri" : mintNFT.setUri,
+                  "setBaseUri" : mintNFT.setBaseUri,
                   "addListing" : mintNFT.addToList,
                   "purchase" : mintNFT.purchase,
-                  "withdraw" : mintNFT.withdraw
+                  "purchaseMany" : mintNFT.purchaseBatch,
+                  "withdraw" : mintNFT.withdraw,
+                  "index" : mintNFT.indexEvents,
+                  "listings" : mintNFT.showListings,
+                  "portfolio" : mintNFT.showPortfolio,
+                  "journalReport" : mintNFT.journalReport,
+                  "serve" : mintNFT.serve,
+                  "jobs" : mintNFT.runJobs,
+                  "broadcast" : mintNFT.broadcast,
+                  "simulate" : mintNFT.simulate
                 }
 
     args = argparser.parse_args()
@@ -491,24 +1296,49 @@ def main():
     # Execute the parse_args() method
     args = vars(args)
 
+    # another chain for this invocation, e.g. a local node or the in-process EVM
+    if args['url']:
+        mintNFT.apiUrl = args['url']
+
+    # read-only queries of one invocation share a single batched request
+    calls = queryCalls( args, mintNFT.fromAddr )
+    if calls:
+        mintNFT.query( args['address'], calls )
+
     # call triggered process
     for call in processes.keys():
         if args[call]:
             func = processes[call]
 
-            if call == 'mint':
+            if call == 'compile':
+                abi, bytecode = func( force=bool(args['rebuild']) )
+
+                focal.logger.info(f"Contract artifact ready: {len(abi)} ABI entries, {len(bytecode) // 2} bytes of bytecode")
+            elif call == 'mint':
                 address = args['address']
                 metahash = args['metahash']
                 edition = args['edition']
-                # apiUrl = args['url']
 
                 func( address, metahash, edition )
+            elif call == 'mintMany':
+                address = args['address']
+                metahash = args['metahash']
+                editions = args['editions']
+
+                func( address, metahash, editions )
+            elif call == 'mintBatch':
+                address = args['address']
+                workers = args['workers']
+                results = args['results']
+
+                func( args['mintBatch'], address, workers, results, args['signOnly'], args['signers'] )
             elif call == 'deploy':
                 name = args['name']
                 symbol = args['symbol']
-                apiUrl = args['url']
 
                 func( name, symbol)
+            elif call == 'metadata' and args['traits']:
+                mintNFT.generateMetadata( args['traits'], args['manifest'], args['outDir'], bool(args['hexIds']) )
             elif call == 'metadata':
                 traitType = args['traitType']
                 Traitvalue = args['Traitvalue']
@@ -517,10 +1347,14 @@ def main():
                 jsonData = args['jsonData']
                 
                 func(traitType,Traitvalue, nftDescription,Nftname, jsonData)
+            elif call in ('setUri', 'setBaseUri'):
+                address = args['address']
+
+                func( address, args[call] )
             elif call == 'ipfs':
                 path = args['path']
                 # pinata = args['pinata']
-                func(path)
+                func(path, args['workers'], args['manifest'])
                 
             elif call == 'addListing':
                 address = args['address']
@@ -537,12 +1371,40 @@ def main():
                 
                 func(address, edition, tid, amount)
                 
+            elif call == 'purchaseMany':
+                address = args['address']
+                editions = args['editions']
+                tids = args['token_ids']
+                amount = args['amount']
+
+                func(address, editions, tids, amount)
+                
             elif call == 'withdraw':
                 address = args['address']
                 amount = args['amount']
 
                 func(address, amount)
 
+            elif call == 'index':
+                func( args['address'], args['fromBlock'], bool(args['follow']) )
+            elif call == 'listings':
+                func( args['address'] )
+            elif call == 'portfolio':
+                owner = args['portfolio'] if isinstance( args['portfolio'], str ) else None
+
+                func( args['address'], owner )
+            elif call == 'broadcast':
+                func( args['broadcast'], args['results'] )
+            elif call == 'jobs':
+                func( args['jobs'], args['workers'], args['results'] )
+            elif call == 'simulate':
+                func( args['simulate'], args['url'], args['workers'], args['results'] )
+            elif call == 'serve':
+                func( args['port'], args['socket'], args['workers'] )
+            elif call == 'journalReport':
+                path = args['journalReport'] if isinstance( args['journalReport'], str ) else None
+
+                func( path )
             else:
                 func()
 
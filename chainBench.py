@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+# --------------------------------------------
+# Gas per operation, tx/s and latency of the NFTTrade operations on a local dev chain
+#
+# python3 chainBench.py [-u url] [-n ops] [-c 1,4,16] [-bs 5,20] [-o bench.json] [-cmp baseline.json -t percent]
+# --------------------------------------------
+
+# import python modules
+import os, sys, json, time, argparse, logging
+
+root = os.path.dirname(os.path.realpath(__file__))
+sys.path.insert(0, root)
+
+from mainStream import focal
+
+# accounts 0 and 1 of the default anvil / hardhat mnemonic: public keys, funded on dev chains only
+devKeys = (
+  '0xac0974bec39a17e36ba4a6b4d238ff944bacb478cbed5efcae784d7bf4f2ff80',
+  '0x59c6995e998f97a5a0044966f0945389dc9e86dae88c7a8412f4603b6b78690d',
+)
+
+# listing price of one edition, in ether as the NFTTrade methods take it
+price = 1
+
+#---------------------------------------
+# Seller and buyer wallets talking to the dev chain at `url`
+#---------------------------------------
+def wallets(url, keys):
+  # set before NFTTrade reads the environment, .env does not override them
+  os.environ['API_URL'] = url
+  os.environ['API_URLS'] = ''
+  os.environ.setdefault('TX_JOURNAL', 'off')
+  os.environ.setdefault('RECEIPT_POLL_INTERVAL', '0.05')
+  os.environ.setdefault('GAS_BUMP_AFTER', '0')
+
+  from eth_account import Account
+  from NFTTrade import NFTTrade
+
+  trades = []
+  for key in keys:
+    trade = NFTTrade()
+    trade.pvtKey = key
+    trade.fromAddr = Account.from_key(key).address
+    trades.append(trade)
+
+  return trades
+
+#---------------------------------------
+# Token ids minted by `receipt`, from its Token_ID events
+#---------------------------------------
+def mintedIds(receipt):
+  from hexbytes import HexBytes
+  from web3 import Web3
+
+  topic = Web3.keccak(text='Token_ID(uint256)')
+
+  return [ int.from_bytes(HexBytes(log['data']), 'big') for log in receipt['logs'] if HexBytes(log['topics'][0]) == topic ]
+
+#---------------------------------------
+# Run `calls` (func, args, wallet) on `executor`, `endpoint` as in OpExecutor.submit; successful receipts and the phase summary
+#---------------------------------------
+def phase(executor, calls, endpoint, items = 1):
+  from txJournal import TxJournal
+
+  def timed(func, args):
+    started = time.monotonic()
+    receipt = func(*args)
+
+    return receipt, time.monotonic() - started
+
+  started = time.monotonic()
+  futures = [ executor.submit(timed, (func, args), wallet, endpoint) for func, args, wallet in calls ]
+
+  receipts, latencies, gas = [], [], []
+  for future in futures:
+    try:
+      receipt, seconds = future.result()
+    except Exception as e:
+      focal.logger.debug("Operation failed: %s", e)
+      continue
+
+    if not receipt or receipt.get('status') != 1:
+      continue
+
+    receipts.append(receipt)
+    latencies.append(seconds * 1000)
+    gas.append(receipt['gasUsed'])
+
+  elapsed = time.monotonic() - started
+  latencies.sort()
+
+  summary = {
+    'count': len(calls),
+    'ok': len(receipts),
+    'failed': len(calls) - len(receipts),
+    'seconds': round(elapsed, 3),
+    'txPerSec': round(len(receipts) / elapsed, 2) if elapsed else None,
+    'gasPerTx': round(sum(gas) / len(gas)) if gas else None,
+    'gasPerItem': round(sum(gas) / len(gas) / items) if gas else None,
+    'latencyMs': { f"p{pct}": round(TxJournal.percentile(latencies, pct), 2) for pct in (50, 95, 99) } if latencies else None,
+  }
+
+  if latencies:
+    summary['latencyMs']['max'] = round(latencies[-1], 2)
+
+  return receipts, summary
+
+#---------------------------------------
+# mint / addListing / purchase / mintBatch / purchaseBatch / withdraw at one concurrency level
+#---------------------------------------
+def workload(seller, buyer, address, ops, concurrency, batchSizes):
+  from opExecutor import OpExecutor
+
+  executor = OpExecutor(concurrency, perWallet=concurrency, perEndpoint=concurrency, retries=int(os.getenv('EXEC_RETRIES', 5)))
+  endpoint = seller.chain.endpoint
+  runs = []
+
+  def run(op, calls, batch = 1):
+    receipts, summary = phase(executor, calls, endpoint, batch)
+    runs.append({ 'op': op, 'concurrency': concurrency, 'batch': batch, **summary })
+
+    return receipts
+
+  receipts = run('mint', [ (seller.mintNFT, (address, f"QmBench{index}", 2), seller.fromAddr) for index in range(ops) ])
+  tokenIds = [ tokenId for receipt in receipts for tokenId in mintedIds(receipt) ]
+
+  run('addListing', [ (seller.addToList, (address, price, tokenId), seller.fromAddr) for tokenId in tokenIds ])
+  run('purchase', [ (buyer.purchase, (address, 1, tokenId, price), buyer.fromAddr) for tokenId in tokenIds ])
+
+  for batch in batchSizes:
+    count = max(1, ops // batch)
+
+    receipts = run('mintBatch', [ (seller.mintBatchNFT, (address, None, [2] * batch), seller.fromAddr) for index in range(count) ], batch)
+    groups = [ mintedIds(receipt) for receipt in receipts ]
+
+    # listing the batch is setup, its cost is already measured above
+    phase(executor, [ (seller.addToList, (address, price, tokenId), seller.fromAddr) for group in groups for tokenId in group ], endpoint)
+
+    run('purchaseBatch', [ (buyer.purchaseBatch, (address, [1] * len(group), group, price * len(group)), buyer.fromAddr) for group in groups ], batch)
+
+  run('withdraw', [ (seller.withdraw, (address, 0), seller.fromAddr) for index in range(ops) ])
+
+  executor.shutdown()
+
+  return runs
+
+#---------------------------------------
+# Runs of `report` worse than `baseline` by more than `tolerance` percent
+#---------------------------------------
+def regressions(report, baseline, tolerance):
+  key = lambda run: (run['op'], run['concurrency'], run['batch'])
+  before = { key(run): run for run in baseline.get('runs', []) }
+  found = []
+
+  for run in report['runs']:
+    old = before.get(key(run))
+    if not old:
+      continue
+
+    limit = 1 + tolerance / 100
+
+    if run['gasPerTx'] and old['gasPerTx'] and run['gasPerTx'] > old['gasPerTx'] * limit:
+      found.append(f"{key(run)} gas per tx {old['gasPerTx']} -> {run['gasPerTx']}")
+
+    if run['txPerSec'] and old['txPerSec'] and run['txPerSec'] * limit < old['txPerSec']:
+      found.append(f"{key(run)} tx/s {old['txPerSec']} -> {run['txPerSec']}")
+
+    if run['latencyMs'] and old['latencyMs'] and run['latencyMs']['p95'] > old['latencyMs']['p95'] * limit:
+      found.append(f"{key(run)} p95 latency {old['latencyMs']['p95']} -> {run['latencyMs']['p95']} ms")
+
+  return found
+
+def main():
+  parser = argparse.ArgumentParser(description='Gas per operation, tx/s and latency of the NFTTrade operations on a local dev chain')
+  parser.add_argument('-u', '--url', default='http://127.0.0.1:8545', help='dev node (anvil, ganache, hardhat), or eth-tester for the in-process EVM')
+  parser.add_argument('-n', '--ops', type=int, default=50, help='transactions per operation and concurrency level')
+  parser.add_argument('-c', '--concurrency', default='1,4,16', help='comma separated concurrency levels')
+  parser.add_argument('-bs', '--batch-sizes', default='5,20', help='comma separated token counts of mintBatch / purchaseBatch')
+  parser.add_argument('-k', '--keys', default=None, help='seller,buyer private keys of funded accounts (default: anvil accounts 0 and 1)')
+  parser.add_argument('-o', '--output', default=None, help='write the JSON report here as well')
+  parser.add_argument('-cmp', '--compare', default=None, help='baseline report to check for regressions')
+  parser.add_argument('-t', '--tolerance', type=float, default=10, help='percent a run may be worse than the baseline')
+  parser.add_argument('-v', '--verbose', action='store_true', help='keep the per transaction log output')
+  args = parser.parse_args()
+
+  keys = args.keys.split(',') if args.keys else devKeys
+  seller, buyer = wallets(args.url, keys)
+
+  if not args.verbose:
+    focal.logger.setLevel(logging.WARNING)
+
+  # the in-process EVM, or a node started without the anvil accounts, funds the wallets itself
+  for trade in (seller, buyer):
+    if not trade.web3.eth.get_balance(trade.fromAddr):
+      trade.chain.fund(trade.fromAddr)
+
+  started = time.monotonic()
+  address = seller.deployAddress('Bench', 'BNCH')
+
+  report = {
+    'url': args.url,
+    'chainId': seller.chain.chainId,
+    'contract': address,
+    'ops': args.ops,
+    'deploySeconds': round(time.monotonic() - started, 3),
+    'runs': [],
+  }
+
+  for concurrency in [ int(level) for level in args.concurrency.split(',') ]:
+    report['runs'] += workload(seller, buyer, address, args.ops, concurrency, [ int(size) for size in args.batch_sizes.split(',') if size.strip() ])
+
+  print(f"{'op':<16}{'conc':>6}{'batch':>7}{'ok':>6}{'fail':>6}{'tx/s':>9}{'gas/tx':>10}{'gas/item':>10}{'p50 ms':>10}{'p95 ms':>10}")
+
+  for run in report['runs']:
+    latency = run['latencyMs'] or {'p50': '-', 'p95': '-'}
+    print(f"{run['op']:<16}{run['concurrency']:>6}{run['batch']:>7}{run['ok']:>6}{run['failed']:>6}{str(run['txPerSec']):>9}{str(run['gasPerTx']):>10}{str(run['gasPerItem']):>10}{latency['p50']:>10}{latency['p95']:>10}")
+
+  if args.output:
+    with open(args.output, 'w') as fp:
+      json.dump(report, fp, indent=2)
+
+  print(json.dumps(report))
+
+  if args.compare:
+    with open(args.compare) as fp:
+      found = regressions(report, json.load(fp), args.tolerance)
+
+    for line in found:
+      print(f"REGRESSION {line}", file=sys.stderr)
+
+    sys.exit(1 if found else 0)
+
+if __name__ == '__main__':
+  main()
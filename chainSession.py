@@ -0,0 +1,147 @@
+
+# import python modules
+import os, threading
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3, middleware
+from web3.middleware import geth_poa_middleware
+
+from rpcProvider import BatchingProvider, InProcessProvider
+
+#---------------------------------------
+# Process wide Web3 session on pooled keep-alive HTTP connections, or on the in-process EVM
+#---------------------------------------
+class ChainSession:
+
+    # one session per endpoint per process
+    sessions = {}
+    sessionsLock = threading.Lock()
+
+    # API_URL of the in-process EVM used for dry runs
+    inProcess = 'eth-tester'
+
+    # main init function
+    def __init__(self, apiUrl, poolSize = 10, timeout = 30, connectTimeout = 5, fallbackUrls = (), batchWindow = 0.002):
+        self.apiUrl = apiUrl
+        # `apiUrl` first, then the failover endpoints
+        self.endpoints = [apiUrl] + [url for url in fallbackUrls if url and url != apiUrl]
+        self.batchWindow = batchWindow
+        self.poolSize = poolSize
+        self.timeout = timeout
+        self.connectTimeout = connectTimeout
+
+        self._web3 = None
+        self._chainId = None
+        self.lock = threading.Lock()
+
+        # contract objects keyed by checksum address
+        self.contracts = {}
+
+    # shared session for `apiUrl`, sized from the environment on first use
+    @classmethod
+    def get(cls, apiUrl):
+        with cls.sessionsLock:
+            session = cls.sessions.get(apiUrl)
+
+            if session is None:
+                session = cls(
+                    apiUrl,
+                    poolSize = int(os.getenv('RPC_POOL_SIZE', 10)),
+                    timeout = float(os.getenv('RPC_TIMEOUT', 30)),
+                    connectTimeout = float(os.getenv('RPC_CONNECT_TIMEOUT', 5)),
+                    fallbackUrls = [url.strip() for url in os.getenv('API_URLS', '').split(',')],
+                    batchWindow = float(os.getenv('RPC_BATCH_WINDOW_MS', 2)) / 1000
+                )
+                cls.sessions[apiUrl] = session
+
+        return session
+
+    # keep-alive HTTP session with a bounded connection pool
+    def httpSession(self):
+        adapter = HTTPAdapter(pool_connections=self.poolSize, pool_maxsize=self.poolSize)
+
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        return session
+
+    # Web3 instance, built on first access and reused afterwards
+    @property
+    def web3(self):
+        if self._web3 is None:
+            with self.lock:
+                if self._web3 is None:
+                    if self.apiUrl == self.inProcess:
+                        self.provider = InProcessProvider()
+
+                        web3 = Web3(provider=self.provider)
+                        # batches run through the same formatters as single calls
+                        self.provider.web3 = web3
+                    else:
+                        self.http = self.httpSession()
+
+                        self.provider = BatchingProvider(
+                            self.endpoints,
+                            self.http,
+                            timeout=(self.connectTimeout, self.timeout),
+                            batchWindow=self.batchWindow,
+                            senders=self.poolSize
+                        )
+
+                        web3 = Web3(provider=self.provider)
+                        web3.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+                    web3.middleware_onion.add(middleware.simple_cache_middleware)
+
+                    self._web3 = web3
+
+        return self._web3
+
+    # chain id of the endpoint, asked once
+    @property
+    def chainId(self):
+        if self._chainId is None:
+            self._chainId = self.web3.eth.chain_id
+
+        return self._chainId
+
+    # dev chains only: send `value` wei (a quarter of its balance by default) to `address` from the node's first unlocked account
+    def fund(self, address, value = None):
+        funder = self.web3.eth.accounts[0]
+        value = value or self.web3.eth.get_balance(funder) // 4
+
+        txHash = self.web3.eth.send_transaction({'from': funder, 'to': Web3.toChecksumAddress(address), 'value': value})
+
+        return self.web3.eth.wait_for_transaction_receipt(txHash)
+
+    # URL of the RPC endpoint the next request most likely goes to, the key of per endpoint limits
+    def endpoint(self):
+        # make sure the provider exists
+        self.web3
+
+        return self.provider.lead() if hasattr(self.provider, 'lead') else self.apiUrl
+
+    # send several JSON-RPC calls in one HTTP request, results come back in call order
+    def rpcBatch(self, calls):
+        # make sure the provider exists
+        self.web3
+
+        return self.provider.batch(calls)
+
+    # contract object for `address`, rebuilt only when the ABI changes
+    def contract(self, address, abi):
+        address = Web3.toChecksumAddress(address)
+
+        with self.lock:
+            cached = self.contracts.get(address)
+
+        if cached is not None and cached[0] == abi:
+            return cached[1]
+
+        contract = self.web3.eth.contract(address, abi=abi)
+
+        with self.lock:
+            self.contracts[address] = (abi, contract)
+
+        return contract
@@ -15,6 +15,11 @@ contract NFTTrade is ERC1155, Ownable, ERC1155Supply {
     string public name;
     string public symbol;
 
+    // per token uris and their common prefix, as ERC1155URIStorage keeps them
+    // but with a getter for the prefix, so it is stored once
+    string private _baseURI;
+    mapping(uint256 => string) private _tokenURIs;
+
     constructor(string memory NftName, string memory NftSymbol) ERC1155("") {
         name = NftName;
         symbol = NftSymbol;
@@ -48,11 +53,86 @@ contract NFTTrade is ERC1155, Ownable, ERC1155Supply {
 
         _mint(account, newItemId, edition, "");
 
-        _setURI(uri);
+        // an empty uri leaves the token on the default `{id}` uri, no storage write
+        if (bytes(uri).length > 0) {
+            _setTokenURI(newItemId, uri);
+        }
 
         emit Token_ID(newItemId);
     }
 
+    function mintBatch(
+        address account,
+        uint256[] memory editions,
+        string[] memory uris
+    ) public payable {
+        require(editions.length > 0, "Nothing to mint");
+        require(
+            uris.length == 0 || uris.length == editions.length,
+            "Give one uri per edition or none"
+        );
+
+        uint256[] memory ids = new uint256[](editions.length);
+        uint256 totalEditions;
+
+        for (uint256 i = 0; i < editions.length; i++) {
+            require(editions[i] > 0, "Edition count cannot be 0");
+
+            _tokenIds.increment();
+            ids[i] = _tokenIds.current();
+            totalEditions += editions[i];
+        }
+
+        require(
+            msg.sender.balance >= EditionPrice * totalEditions,
+            "you don't have enough ether to perform this transaction"
+        );
+
+        _mintBatch(account, ids, editions, "");
+
+        for (uint256 i = 0; i < ids.length; i++) {
+            if (uris.length > 0 && bytes(uris[i]).length > 0) {
+                _setTokenURI(ids[i], uris[i]);
+            }
+
+            emit Token_ID(ids[i]);
+        }
+    }
+
+    // default uri of tokens minted without one, e.g. "ipfs://<cid>/{id}.json"
+    function setURI(string memory newuri) public onlyOwner {
+        _setURI(newuri);
+    }
+
+    // prefix of every per token uri, e.g. "ipfs://"
+    function setBaseURI(string memory newBaseURI) public onlyOwner {
+        _baseURI = newBaseURI;
+    }
+
+    function baseURI() public view returns (string memory) {
+        return _baseURI;
+    }
+
+    // the prefix and the token's own uri, or the default `{id}` uri for tokens minted without one
+    function uri(uint256 tokenId)
+        public
+        view
+        override
+        returns (string memory)
+    {
+        string memory tokenURI = _tokenURIs[tokenId];
+
+        return
+            bytes(tokenURI).length > 0
+                ? string(abi.encodePacked(_baseURI, tokenURI))
+                : super.uri(tokenId);
+    }
+
+    function _setTokenURI(uint256 tokenId, string memory tokenURI) internal {
+        _tokenURIs[tokenId] = tokenURI;
+        emit URI(uri(tokenId), tokenId);
+    }
+
     function _beforeTokenTransfer(
         address operator,
         address from,
@@ -65,12 +145,12 @@ contract NFTTrade is ERC1155, Ownable, ERC1155Supply {
     }
 
     mapping(address => mapping(uint256 => Listing)) public listings;
-    mapping(address => uint256) public balances;
 
+    // one storage slot: 96 bits of price next to the 160 bit seller address,
+    // the token id is already the mapping key
     struct Listing {
-        uint256 price;
+        uint96 price;
         address seller;
-        uint256 tokenID;
     }
 
     function addListing(
@@ -79,21 +159,21 @@ contract NFTTrade is ERC1155, Ownable, ERC1155Supply {
         uint256 tokenId
     ) public {
         require(price > 0, "Price must be at least 1 wei");
+        require(price <= type(uint96).max, "Price is too high");
 
         ERC1155 token = ERC1155(contractAddress);
 
-        setApprovalForAll(contractAddress, true);
-
         require(
             token.balanceOf(msg.sender, tokenId) > 0,
             "Caller Must own given Token"
         );
 
-        listings[contractAddress][tokenId] = Listing(
-            price,
-            msg.sender,
-            tokenId
-        );
+        // approval is written once per seller, not on every listing
+        if (!isApprovedForAll(msg.sender, contractAddress)) {
+            _setApprovalForAll(msg.sender, contractAddress, true);
+        }
+
+        listings[contractAddress][tokenId] = Listing(uint96(price), msg.sender);
         emit AddToListing(price, msg.sender, tokenId);
     }
 
@@ -121,8 +201,6 @@ contract NFTTrade is ERC1155, Ownable, ERC1155Supply {
             "Please send the correct amount"
         );
 
-        balances[msg.sender] += amount;
-
         ERC1155 token = ERC1155(contractAddress);
 
         token.safeTransferFrom(
@@ -142,6 +220,65 @@ contract NFTTrade is ERC1155, Ownable, ERC1155Supply {
         );
     }
 
+    function purchaseBatch(
+        address contractAddress,
+        uint256[] memory editionCounts,
+        uint256[] memory tokenIds,
+        uint256 amount
+    ) public payable {
+        require(
+            tokenIds.length > 0 && tokenIds.length == editionCounts.length,
+            "Token ids and edition counts must match"
+        );
+
+        address seller = listings[contractAddress][tokenIds[0]].seller;
+        uint256 total;
+        // kept for the Transfer events, so listings are read from storage once
+        uint256[] memory prices = new uint256[](tokenIds.length);
+
+        for (uint256 i = 0; i < tokenIds.length; i++) {
+            Listing memory item = listings[contractAddress][tokenIds[i]];
+
+            require(
+                editionCounts[i] > 0,
+                "Edition Count should be equal to or more than 1"
+            );
+            require(item.price > 0, "Token is not listed");
+            require(
+                item.seller == seller,
+                "All tokens must be listed by the same seller"
+            );
+
+            prices[i] = item.price * editionCounts[i];
+            total += prices[i];
+        }
+
+        require(msg.sender != seller, "You can't buy your own nft");
+
+        require(msg.sender.balance >= total, "insufficient funds");
+        require(amount == total, "Please send the correct amount");
+
+        ERC1155 token = ERC1155(contractAddress);
+
+        token.safeBatchTransferFrom(
+            seller,
+            msg.sender,
+            tokenIds,
+            editionCounts,
+            ""
+        );
+
+        for (uint256 i = 0; i < tokenIds.length; i++) {
+            emit Transfer(
+                seller,
+                msg.sender,
+                editionCounts[i],
+                tokenIds[i],
+                prices[i]
+            );
+        }
+    }
+
     function getBalance() public view returns (uint256) {
         return owner().balance;
     }
@@ -0,0 +1,61 @@
+# import python modules
+import os
+
+#---------------------------------------
+# Throwaway chain for measurements: in-process eth-tester, or a dev node with unlocked accounts (anvil, ganache, hardhat)
+#---------------------------------------
+class DevChain:
+
+    # main init function
+    def __init__(self, url = None):
+        from web3 import Web3
+
+        if url:
+            provider = Web3.HTTPProvider(url, request_kwargs={'timeout': 60})
+        else:
+            from web3 import EthereumTesterProvider
+            provider = EthereumTesterProvider()
+
+        self.url = url
+        self.web3 = Web3(provider)
+        self.accounts = self.web3.eth.accounts
+
+    # (abi, bytecode) of the NFTTrade contract in solidity `source`, compiled with the settings of NFTTrade.compileSol
+    @staticmethod
+    def compile(source, settings, file = 'ERC1155.sol'):
+        import solcx
+
+        spec = {
+            "language": "Solidity",
+            "sources": { file: { "content": source } },
+            "settings": settings,
+        }
+
+        # imports of @openzeppelin resolve from node_modules next to this file
+        root = os.path.dirname(os.path.realpath(__file__))
+        compileOut = solcx.compile_standard(spec, allow_paths=root, base_path=root)
+        contract = compileOut['contracts'][file]['NFTTrade']
+
+        return contract['abi'], contract['evm']['bytecode']['object']
+
+    # deploy and return (contract, receipt)
+    def deploy(self, abi, bytecode, *args, sender = None):
+        sender = sender or self.accounts[0]
+        factory = self.web3.eth.contract(abi=abi, bytecode=bytecode)
+
+        txHash = factory.constructor(*args).transact({'from': sender})
+        receipt = self.web3.eth.wait_for_transaction_receipt(txHash)
+
+        return self.web3.eth.contract(address=receipt.contractAddress, abi=abi), receipt
+
+    # call `name(*args)` on `contract` from `sender` and return the receipt; reverts raise
+    def transact(self, contract, name, *args, sender = None, value = 0):
+        sender = sender or self.accounts[0]
+
+        txHash = contract.functions[name](*args).transact({'from': sender, 'value': value})
+        receipt = self.web3.eth.wait_for_transaction_receipt(txHash)
+
+        if receipt.status != 1:
+            raise RuntimeError(f"{name} reverted in {receipt.transactionHash.hex()}")
+
+        return receipt
@@ -0,0 +1,246 @@
+
+# import python modules
+import json, sqlite3, threading
+from web3 import Web3
+
+from mainStream import focal
+
+#---------------------------------------
+# Local listings / ownership database built from contract logs
+#---------------------------------------
+class EventIndexer:
+
+    schema = '''
+        CREATE TABLE IF NOT EXISTS checkpoints (contract TEXT PRIMARY KEY, block INTEGER, hash TEXT);
+        CREATE TABLE IF NOT EXISTS block_hashes (contract TEXT, number INTEGER, hash TEXT, PRIMARY KEY (contract, number));
+        CREATE TABLE IF NOT EXISTS events (
+            contract TEXT, block INTEGER, log_index INTEGER, tx_hash TEXT, event TEXT, args TEXT,
+            PRIMARY KEY (contract, block, log_index)
+        );
+        CREATE TABLE IF NOT EXISTS tokens (contract TEXT, token_id INTEGER, block INTEGER, tx_hash TEXT, PRIMARY KEY (contract, token_id));
+        CREATE TABLE IF NOT EXISTS listings (
+            contract TEXT, token_id INTEGER, price TEXT, seller TEXT, block INTEGER,
+            PRIMARY KEY (contract, token_id)
+        );
+        CREATE TABLE IF NOT EXISTS balances (
+            contract TEXT, owner TEXT, token_id INTEGER, amount INTEGER,
+            PRIMARY KEY (contract, owner, token_id)
+        );
+        CREATE TABLE IF NOT EXISTS sales (
+            contract TEXT, block INTEGER, log_index INTEGER, tx_hash TEXT,
+            seller TEXT, buyer TEXT, token_id INTEGER, editions INTEGER, amount TEXT,
+            PRIMARY KEY (contract, block, log_index)
+        );
+        CREATE INDEX IF NOT EXISTS balances_owner ON balances (owner);
+    '''
+
+    zeroAddress = '0x0000000000000000000000000000000000000000'
+
+    # main init function
+    def __init__(self, web3, contract, dbPath = 'nft-index.db', chunkSize = 2000, confirmations = 5, reorgDepth = 64):
+        self.web3 = web3
+        self.contract = contract
+        self.address = contract.address
+        self.chunkSize = chunkSize
+        self.confirmations = confirmations
+        self.reorgDepth = reorgDepth
+
+        self.db = sqlite3.connect(dbPath, check_same_thread=False)
+        self.db.executescript(self.schema)
+        self.lock = threading.Lock()
+
+        # topic0 -> event name, for every event in the ABI
+        self.topics = {}
+        for entry in contract.abi:
+            if entry.get('type') == 'event' and not entry.get('anonymous'):
+                signature = f"{entry['name']}({','.join(arg['type'] for arg in entry['inputs'])})"
+                self.topics[Web3.keccak(text=signature).hex()] = entry['name']
+
+    # last indexed block, or None before the first run
+    def checkpoint(self):
+        row = self.db.execute('SELECT block, hash FROM checkpoints WHERE contract = ?', (self.address,)).fetchone()
+
+        return row
+
+    # index every confirmed block after the checkpoint; returns the new checkpoint
+    def sync(self, fromBlock = 0):
+        head = self.web3.eth.block_number - self.confirmations
+
+        checkpoint = self.checkpoint()
+        start = fromBlock if checkpoint is None else max(fromBlock, self.rewindReorg(checkpoint) + 1)
+
+        chunk = self.chunkSize
+
+        while start <= head:
+            end = min(start + chunk - 1, head)
+
+            try:
+                logs = self.web3.eth.getLogs({'address': self.address, 'fromBlock': start, 'toBlock': end})
+            except Exception as e:
+                if chunk == 1:
+                    raise
+
+                # range or result limit of the provider, retry a smaller range
+                chunk = max(1, chunk // 2)
+                focal.logger.debug("getLogs %d-%d failed (%s), chunk now %d", start, end, e, chunk)
+                continue
+
+            endHash = self.web3.eth.get_block(end)['hash'].hex()
+
+            with self.lock, self.db:
+                for log in logs:
+                    self.apply(log)
+
+                self.db.execute('INSERT OR REPLACE INTO block_hashes VALUES (?, ?, ?)', (self.address, end, endHash))
+                # only the latest `reorgDepth` chunk boundaries are needed to find a fork point
+                self.db.execute(
+                    'DELETE FROM block_hashes WHERE contract = ? AND number NOT IN (SELECT number FROM block_hashes WHERE contract = ? ORDER BY number DESC LIMIT ?)',
+                    (self.address, self.address, self.reorgDepth)
+                )
+                self.db.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)', (self.address, end, endHash))
+
+            focal.logger.debug("Indexed blocks %d-%d: %d logs", start, end, len(logs))
+
+            # quiet ranges let the window grow again
+            if len(logs) < 1000:
+                chunk = min(chunk * 2, self.chunkSize * 16)
+
+            start = end + 1
+
+        return self.checkpoint()
+
+    # compare stored block hashes with the chain and undo everything after the fork point
+    def rewindReorg(self, checkpoint):
+        block, blockHash = checkpoint
+
+        if self.web3.eth.get_block(block)['hash'].hex() == blockHash:
+            return block
+
+        stored = self.db.execute(
+            'SELECT number, hash FROM block_hashes WHERE contract = ? AND number < ? ORDER BY number DESC',
+            (self.address, block)
+        ).fetchall()
+
+        forkBlock = -1
+        for number, numberHash in stored:
+            if self.web3.eth.get_block(number)['hash'].hex() == numberHash:
+                forkBlock = number
+                break
+
+        focal.logger.warning(f"Reorg detected after block {forkBlock}, rewinding index from block {block}")
+
+        with self.lock, self.db:
+            self.revert(forkBlock)
+
+        return forkBlock
+
+    # remove every event after `block` and the state derived from it
+    def revert(self, block):
+        events = self.db.execute(
+            'SELECT event, args FROM events WHERE contract = ? AND block > ? ORDER BY block DESC, log_index DESC',
+            (self.address, block)
+        ).fetchall()
+
+        listed = set()
+        for event, args in events:
+            args = json.loads(args)
+
+            if event in ('TransferSingle', 'TransferBatch'):
+                for tokenId, amount in self.transfers(event, args):
+                    self.credit(args['from'], tokenId, amount)
+                    self.credit(args['to'], tokenId, -amount)
+            elif event == 'AddToListing':
+                listed.add(int(args['tokenID']))
+
+        self.db.execute('DELETE FROM events WHERE contract = ? AND block > ?', (self.address, block))
+        self.db.execute('DELETE FROM sales WHERE contract = ? AND block > ?', (self.address, block))
+        self.db.execute('DELETE FROM tokens WHERE contract = ? AND block > ?', (self.address, block))
+        self.db.execute('DELETE FROM block_hashes WHERE contract = ? AND number > ?', (self.address, block))
+
+        # listings fall back to the latest surviving AddToListing
+        for tokenId in listed:
+            self.db.execute('DELETE FROM listings WHERE contract = ? AND token_id = ?', (self.address, tokenId))
+
+            row = self.db.execute(
+                "SELECT block, args FROM events WHERE contract = ? AND event = 'AddToListing' AND json_extract(args, '$.tokenID') = ? ORDER BY block DESC, log_index DESC LIMIT 1",
+                (self.address, str(tokenId))
+            ).fetchone()
+
+            if row:
+                args = json.loads(row[1])
+                self.db.execute('INSERT INTO listings VALUES (?, ?, ?, ?, ?)', (self.address, tokenId, args['price'], args['seller'], row[0]))
+
+        if block < 0:
+            self.db.execute('DELETE FROM checkpoints WHERE contract = ?', (self.address,))
+        else:
+            blockHash = self.web3.eth.get_block(block)['hash'].hex()
+            self.db.execute('INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)', (self.address, block, blockHash))
+
+    # (token id, amount) pairs moved by a TransferSingle / TransferBatch
+    @staticmethod
+    def transfers(event, args):
+        if event == 'TransferSingle':
+            return [ (int(args['id']), int(args['value'])) ]
+
+        return [ (int(tokenId), int(value)) for tokenId, value in zip(args['ids'], args['values']) ]
+
+    def credit(self, owner, tokenId, amount):
+        if owner == self.zeroAddress:
+            return
+
+        self.db.execute(
+            'INSERT INTO balances VALUES (?, ?, ?, ?) ON CONFLICT (contract, owner, token_id) DO UPDATE SET amount = amount + excluded.amount',
+            (self.address, owner, tokenId, amount)
+        )
+
+    # decode one log and fold it into the materialised tables
+    def apply(self, log):
+        name = self.topics.get(log['topics'][0].hex()) if log['topics'] else None
+        if name is None:
+            return
+
+        decoded = getattr(self.contract.events, name)().processLog(log)
+
+        # uint256 values are kept as strings, they do not fit SQLite integers
+        args = { key: (str(value) if isinstance(value, int) else [str(item) for item in value] if isinstance(value, (list, tuple)) else value) for key, value in decoded['args'].items() }
+
+        block = log['blockNumber']
+        logIndex = log['logIndex']
+        txHash = log['transactionHash'].hex()
+
+        self.db.execute('INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?)', (self.address, block, logIndex, txHash, name, json.dumps(args)))
+
+        if name in ('TransferSingle', 'TransferBatch'):
+            for tokenId, amount in self.transfers(name, args):
+                self.credit(args['from'], tokenId, -amount)
+                self.credit(args['to'], tokenId, amount)
+        elif name == 'Token_ID':
+            self.db.execute('INSERT OR REPLACE INTO tokens VALUES (?, ?, ?, ?)', (self.address, int(args['tokenid']), block, txHash))
+        elif name == 'AddToListing':
+            self.db.execute('INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?)', (self.address, int(args['tokenID']), args['price'], args['seller'], block))
+        elif name == 'Transfer':
+            self.db.execute(
+                'INSERT OR REPLACE INTO sales VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (self.address, block, logIndex, txHash, args['from'], args['to'], int(args['tokenId']), int(args['EditionCount']), args['amount'])
+            )
+
+    # current listings, cheapest first
+    def listings(self):
+        rows = self.db.execute(
+            'SELECT token_id, price, seller, block FROM listings WHERE contract = ?',
+            (self.address,)
+        ).fetchall()
+
+        return sorted(
+            ({'tokenId': tokenId, 'price': int(price), 'seller': seller, 'block': block} for tokenId, price, seller, block in rows),
+            key=lambda listing: listing['price']
+        )
+
+    # token id -> amount held by `owner`
+    def portfolio(self, owner):
+        rows = self.db.execute(
+            'SELECT token_id, amount FROM balances WHERE contract = ? AND owner = ? AND amount > 0 ORDER BY token_id',
+            (self.address, Web3.toChecksumAddress(owner))
+        ).fetchall()
+
+        return dict(rows)
@@ -0,0 +1,244 @@
+# import python modules
+import os, time, threading
+from concurrent.futures import Future
+
+from mainStream import focal
+
+#---------------------------------------
+# Re-sends transactions stuck in the mempool at the same nonce with higher fees
+#---------------------------------------
+class FeeBumper:
+
+    # one bumper per chain session per process
+    bumpers = {}
+    bumpersLock = threading.Lock()
+
+    # fee fields of EIP-1559 and legacy transactions
+    feeFields = ('maxFeePerGas', 'maxPriorityFeePerGas', 'gasPrice')
+
+    # main init function
+    def __init__(self, chain, tracker, oracle, after = 60.0, percent = 12.5, maxBumps = 5, maxFee = None, checkInterval = 5.0):
+        self.chain = chain
+        self.tracker = tracker
+        self.oracle = oracle
+        # seconds a transaction may stay pending before it is replaced, 0 disables bumping
+        self.after = after
+        # nodes refuse replacements that raise the fees by less than 10%
+        self.percent = max(percent, 10)
+        self.maxBumps = maxBumps
+        self.maxFee = maxFee
+        self.checkInterval = checkInterval
+
+        # (sender, nonce) -> watched transaction
+        self.watched = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    # shared bumper for `chain`, configured from the environment on first use
+    @classmethod
+    def get(cls, chain, tracker, oracle):
+        with cls.bumpersLock:
+            bumper = cls.bumpers.get(chain.apiUrl)
+
+            if bumper is None:
+                maxFee = float(os.getenv('GAS_BUMP_MAX_GWEI', 0))
+
+                bumper = cls(
+                    chain,
+                    tracker,
+                    oracle,
+                    after = float(os.getenv('GAS_BUMP_AFTER', 60)),
+                    percent = float(os.getenv('GAS_BUMP_PERCENT', 12.5)),
+                    maxBumps = int(os.getenv('GAS_BUMP_MAX', 5)),
+                    maxFee = int(maxFee * 10**9) if maxFee else None
+                )
+                cls.bumpers[chain.apiUrl] = bumper
+
+        return bumper
+
+    # future of the receipt of whichever version of the transaction lands; `sign(tfrData)` -> (raw tx, tx hash),
+    # `send(raw tx, tx hash)` -> hex hash, also when the node already knows it or may have received it before failing
+    def watch(self, tfrData, txHash, sign, send):
+        if not isinstance(txHash, str):
+            txHash = txHash.hex()
+
+        future = Future()
+        # every hash sent for this nonce, the landed one is reported with the receipt
+        future.hashes = [txHash]
+
+        if not self.after:
+            self.follow(future, txHash, self.tracker.track(txHash))
+            return future
+
+        # old versions may be mined after a replacement was sent, so they are tracked until the last bump expires
+        timeout = self.after * (self.maxBumps + 1) + self.tracker.timeout
+
+        watched = {
+            'tfrData': dict(tfrData),
+            'sign': sign,
+            'send': send,
+            'future': future,
+            'sentAt': time.monotonic(),
+            'bumps': 0,
+            'timeout': timeout,
+            'failed': 0,
+        }
+
+        with self.lock:
+            self.watched[(tfrData.get('from'), tfrData['nonce'])] = watched
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='fee-bumper', daemon=True)
+                self.thread.start()
+
+        self.follow(future, txHash, self.tracker.track(txHash, timeout=timeout), watched)
+
+        return future
+
+    # resolve `future` from the tracker future of one of its hashes
+    def follow(self, future, txHash, tracked, watched = None):
+        def done(tracked):
+            if future.done():
+                return
+
+            error = tracked.exception()
+
+            if error is None:
+                self.settle(future, watched)
+                future.set_result(tracked.result())
+                return
+
+            if watched is None:
+                future.set_exception(error)
+                return
+
+            # only give up once every version sent failed; the first one is tracked the longest
+            with self.lock:
+                watched['failed'] += 1
+                lost = watched['failed'] == len(future.hashes)
+
+            if lost:
+                self.settle(future, watched)
+                future.set_exception(error)
+
+        tracked.add_done_callback(done)
+
+    # stop watching once one version landed, and stop polling the others
+    def settle(self, future, watched):
+        if watched is None:
+            return
+
+        tfrData = watched['tfrData']
+
+        with self.lock:
+            self.watched.pop((tfrData.get('from'), tfrData['nonce']), None)
+
+        for txHash in future.hashes:
+            self.tracker.untrack(txHash)
+
+    def run(self):
+        while True:
+            time.sleep(self.checkInterval)
+
+            now = time.monotonic()
+
+            with self.lock:
+                stuck = [
+                    watched for watched in self.watched.values()
+                    if now - watched['sentAt'] > self.after and watched['bumps'] < self.maxBumps
+                ]
+
+            for watched in stuck:
+                try:
+                    self.bump(watched)
+                except Exception as e:
+                    focal.logger.debug("Fee bump of nonce %s failed: %s", watched['tfrData']['nonce'], e)
+
+    # fees raised by `percent` over the last version, or to the current suggestion if that is higher
+    def bumpedFees(self, tfrData):
+        suggestion = self.oracle.fees()
+        fees = {}
+
+        for field in self.feeFields:
+            if field not in tfrData:
+                continue
+
+            current = tfrData[field]
+            current = int(current, 16) if isinstance(current, str) else current
+
+            bumped = max(int(current * (100 + self.percent) / 100) + 1, suggestion.get(field, 0))
+
+            if self.maxFee is not None:
+                bumped = min(bumped, self.maxFee)
+
+            fees[field] = bumped
+
+        # the tip can never exceed the fee cap
+        if 'maxPriorityFeePerGas' in fees:
+            fees['maxPriorityFeePerGas'] = min(fees['maxPriorityFeePerGas'], fees['maxFeePerGas'])
+
+        return fees
+
+    # re-sign and send the transaction at the same nonce with higher fees
+    def bump(self, watched):
+        # a failing attempt counts too, so a broken transaction is not retried forever
+        with self.lock:
+            watched['bumps'] += 1
+            watched['sentAt'] = time.monotonic()
+
+        tfrData = dict(watched['tfrData'])
+        fees = self.bumpedFees(tfrData)
+
+        current = { field: (int(tfrData[field], 16) if isinstance(tfrData[field], str) else tfrData[field]) for field in fees }
+        # a replacement raising any fee by less than 10% would be refused anyway
+        if any(fees[field] * 10 < current[field] * 11 for field in fees):
+            focal.logger.warning("Nonce %s is stuck at the GAS_BUMP_MAX_GWEI cap", tfrData['nonce'])
+
+            with self.lock:
+                watched['bumps'] = self.maxBumps
+
+            return
+
+        for field, fee in fees.items():
+            tfrData[field] = hex(fee)
+
+        rawTxn, txHash = watched['sign'](tfrData)
+        future = watched['future']
+
+        try:
+            txHash = watched['send'](rawTxn, txHash)
+        except Exception as e:
+            message = str(e).lower()
+
+            if 'nonce too low' in message:
+                # an earlier version was mined, its receipt resolves the future
+                focal.logger.debug("Nonce %s needs no replacement: %s", tfrData['nonce'], e)
+                return
+
+            if 'underpriced' not in message:
+                raise
+
+            # the next round bumps again from these fees
+            focal.logger.debug("Replacement of nonce %s underpriced: %s", tfrData['nonce'], e)
+
+            with self.lock:
+                watched['tfrData'] = tfrData
+
+            return
+
+        # a replacement the node already knew, or that may have reached it, is tracked like an accepted one;
+        # the done callbacks of earlier versions count the hashes under the lock
+        with self.lock:
+            watched['tfrData'] = tfrData
+            resent = txHash in future.hashes
+
+            if not resent:
+                future.hashes.append(txHash)
+
+        # the same fees signed again, that version is followed already
+        if resent:
+            return
+
+        focal.logger.info("Nonce %s pending too long, replaced by %s with fees %s", tfrData['nonce'], txHash, fees)
+
+        self.follow(future, txHash, self.tracker.track(txHash, timeout=watched['timeout']), watched)
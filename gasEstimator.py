@@ -0,0 +1,133 @@
+
+# import python modules
+import os, threading
+
+#---------------------------------------
+# Gas limits learned per contract function
+#---------------------------------------
+class GasEstimator:
+
+    # one estimator per process
+    shared = None
+    sharedLock = threading.Lock()
+
+    # calls that write per token storage: function -> index of its token id argument. Writing a slot the first time
+    # costs 20000 gas against 2900 for a rewrite, so a new listing or a buyer new to a token is not keyed like a repeat
+    firstWrites = {'addListing': 2, 'purchase': 2, 'purchaseBatch': 2}
+
+    # the first listing of a seller may also approve the contract, it is always estimated live
+    approvals = ('addListing',)
+
+    # main init function
+    def __init__(self, headroom = 1.2):
+        self.headroom = headroom
+        self.lock = threading.Lock()
+
+        # (contract address, function name, argument shape, storage case) -> largest gas seen
+        self.known = {}
+
+        # (contract address, function name, sender) called and (..., token id) written by a mined transaction
+        self.callers = set()
+        self.written = set()
+
+    # process wide estimator, configured from the environment on first use
+    @classmethod
+    def get(cls):
+        with cls.sharedLock:
+            if cls.shared is None:
+                cls.shared = cls( headroom = float(os.getenv('GAS_HEADROOM', 1.2)) )
+
+        return cls.shared
+
+    # cache key: gas depends on array lengths and string sizes, not on the values themselves, and on the storage `case`
+    @staticmethod
+    def key(address, fnName, contractArgs, case = None):
+        shape = []
+
+        for arg in contractArgs:
+            if isinstance(arg, (list, tuple)):
+                # a list of strings, e.g. token uris, is paid by the words of all its elements
+                words = [ words for words in map(GasEstimator.words, arg) if words is not None ]
+                shape.append(('list', len(arg), sum(words)) if words else ('list', len(arg)))
+            elif GasEstimator.words(arg) is not None:
+                shape.append(('str', GasEstimator.words(arg)))
+            else:
+                shape.append(None)
+
+        return (address, fnName, tuple(shape), case)
+
+    # calldata and storage are paid per 32 byte word; None for values of fixed size, addresses and hex included
+    @staticmethod
+    def words(arg):
+        if isinstance(arg, (str, bytes)) and not (isinstance(arg, str) and arg.startswith('0x')):
+            return (len(arg) + 31) // 32
+
+        return None
+
+    # 'first' for a possibly approving first call of `sender`, 'new' while one of the token ids was not written by it, 'again' after
+    def case(self, address, fnName, contractArgs, sender):
+        if fnName not in self.firstWrites:
+            return None
+
+        sender = (sender or '').lower()
+        tokenIds = contractArgs[self.firstWrites[fnName]]
+        tokenIds = tokenIds if isinstance(tokenIds, (list, tuple)) else [tokenIds]
+
+        with self.lock:
+            if fnName in self.approvals and (address, fnName, sender) not in self.callers:
+                return 'first'
+
+            if all((address, fnName, sender, tokenId) in self.written for tokenId in tokenIds):
+                return 'again'
+
+        return 'new'
+
+    # gas limit for calling `fnName` with `contractArgs`, live estimate only on a miss or a first approving call
+    def estimate(self, contract, fnName, contractArgs, sender):
+        case = self.case(contract.address, fnName, contractArgs, sender)
+        key = self.key(contract.address, fnName, contractArgs, case)
+
+        with self.lock:
+            known = None if case == 'first' else self.known.get(key)
+
+        if known is None:
+            known = getattr( contract.functions, fnName )(*contractArgs).estimateGas({'from': sender})
+
+            if case != 'first':
+                self.learn(key, known)
+
+        return int(known * self.headroom)
+
+    # remember the gas a call really used, keeping the largest value seen
+    def learn(self, key, gasUsed):
+        with self.lock:
+            self.known[key] = max(self.known.get(key, 0), gasUsed)
+
+    # drop what we know about a call, e.g. after one of its transactions reverted
+    def forget(self, key):
+        with self.lock:
+            self.known.pop(key, None)
+
+    # feed a mined receipt back: learn its gas use, or forget the call if it reverted
+    def observe(self, address, fnName, contractArgs, receipt):
+        sender = receipt.get('from')
+        case = self.case(address, fnName, contractArgs, sender)
+        key = self.key(address, fnName, contractArgs, case)
+
+        if receipt.get('status') == 0:
+            self.forget(key)
+            return
+
+        if receipt.get('gasUsed') and case != 'first':
+            self.learn(key, receipt['gasUsed'])
+
+        # later calls of this sender on these token ids rewrite storage that exists now
+        if case is not None:
+            sender = (sender or '').lower()
+            tokenIds = contractArgs[self.firstWrites[fnName]]
+
+            with self.lock:
+                self.callers.add((address, fnName, sender))
+
+                for tokenId in (tokenIds if isinstance(tokenIds, (list, tuple)) else [tokenIds]):
+                    self.written.add((address, fnName, sender, tokenId))
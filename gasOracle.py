@@ -0,0 +1,122 @@
+
+# import python modules
+import os, time, threading
+
+from mainStream import focal
+
+#---------------------------------------
+# EIP-1559 fee suggestions from eth_feeHistory, cached per block
+#---------------------------------------
+class GasOracle:
+
+    # one oracle per chain session per process
+    oracles = {}
+    oraclesLock = threading.Lock()
+
+    # main init function
+    def __init__(self, chain, blocks = 10, percentile = 50, minPriority = 30 * 10**9, baseMultiplier = 2, refreshInterval = 2.0):
+        self.chain = chain
+        self.blocks = blocks
+        self.percentile = percentile
+        self.minPriority = minPriority
+        self.baseMultiplier = baseMultiplier
+        self.refreshInterval = refreshInterval
+
+        # latest suggestion and the block it was computed for
+        self.suggestion = None
+        self.block = None
+        self.lock = threading.Lock()
+        self.thread = None
+
+    # shared oracle for `chain`, configured from the environment on first use
+    @classmethod
+    def get(cls, chain):
+        with cls.oraclesLock:
+            oracle = cls.oracles.get(chain.apiUrl)
+
+            if oracle is None:
+                oracle = cls(
+                    chain,
+                    blocks = int(os.getenv('GAS_HISTORY_BLOCKS', 10)),
+                    percentile = float(os.getenv('GAS_PRIORITY_PERCENTILE', 50)),
+                    minPriority = int(float(os.getenv('GAS_MIN_PRIORITY_GWEI', 30)) * 10**9),
+                    baseMultiplier = float(os.getenv('GAS_BASE_FEE_MULTIPLIER', 2)),
+                    refreshInterval = float(os.getenv('GAS_REFRESH_INTERVAL', 2))
+                )
+                cls.oracles[chain.apiUrl] = oracle
+
+        return oracle
+
+    # fee fields for a transaction, never waits on the node once warm
+    def fees(self):
+        with self.lock:
+            suggestion = self.suggestion
+
+        if suggestion is None:
+            suggestion = self.refresh()
+
+        if self.thread is None:
+            with self.lock:
+                if self.thread is None:
+                    self.thread = threading.Thread(target=self.run, name='gas-oracle', daemon=True)
+                    self.thread.start()
+
+        return dict(suggestion)
+
+    # worst case price per gas unit of `fees`
+    @staticmethod
+    def maxPrice(fees):
+        return fees.get('maxFeePerGas', fees.get('gasPrice'))
+
+    def run(self):
+        while True:
+            time.sleep(self.refreshInterval)
+
+            try:
+                self.refresh()
+            except Exception as e:
+                # keep serving the last suggestion until the node answers again
+                focal.logger.debug("Gas oracle refresh failed: %s", e)
+
+    # recompute the suggestion if a new block arrived since the last one
+    def refresh(self):
+        blockNumber = self.chain.web3.eth.block_number
+
+        with self.lock:
+            if self.suggestion is not None and blockNumber == self.block:
+                return self.suggestion
+
+        history, = self.chain.rpcBatch([
+            ('eth_feeHistory', [hex(self.blocks), hex(blockNumber), [self.percentile]]),
+        ])
+
+        if isinstance(history, Exception) or not history or not history.get('baseFeePerGas'):
+            # pre-London node, fall back to a legacy gas price
+            suggestion = {'gasPrice': self.chain.web3.eth.gas_price}
+        else:
+            suggestion = self.suggest(history)
+
+        with self.lock:
+            self.suggestion = suggestion
+            self.block = blockNumber
+
+        return suggestion
+
+    # max fee covers `baseMultiplier` times the next base fee plus the median tip of recent blocks
+    def suggest(self, history):
+        # the last entry is the base fee of the upcoming block
+        nextBaseFee = int(history['baseFeePerGas'][-1], 16)
+
+        rewards = sorted(
+            int(reward[0], 16)
+            for reward in history.get('reward') or []
+            if reward and int(reward[0], 16) > 0
+        )
+
+        priority = rewards[len(rewards) // 2] if rewards else 0
+        priority = max(priority, self.minPriority)
+
+        return {
+            'maxPriorityFeePerGas': priority,
+            'maxFeePerGas': int(nextBaseFee * self.baseMultiplier) + priority,
+        }
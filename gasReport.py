@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+# --------------------------------------------
+# Gas used per operation by an older revision of contracts/ERC1155.sol and the working tree
+#
+# python3 gasReport.py [-r git revision] [-u dev node url] [-o report.json]
+# --------------------------------------------
+
+# import python modules
+import os, sys, json, argparse, subprocess
+
+root = os.path.dirname(os.path.realpath(__file__))
+contract = 'contracts/ERC1155.sol'
+
+# price of one edition in the listings of the workload
+price = 10**15
+
+# the contract before listings were packed into one slot
+packedBefore = '0cbe5f8'
+
+#---------------------------------------
+# Source of the contract at git `rev`; when it matches the working tree, the revision before its last change
+#---------------------------------------
+def oldSource(rev, current):
+  def show(rev):
+    return subprocess.run(['git', 'show', f"{rev}:{contract}"], cwd=root, capture_output=True, text=True, check=True).stdout
+
+  source = show(rev)
+
+  if source == current:
+    revs = subprocess.run(['git', 'log', '-n', '2', '--format=%H', rev, '--', contract], cwd=root, capture_output=True, text=True, check=True).stdout.split()
+
+    if len(revs) < 2:
+      sys.exit(f"{contract} at {rev} is the working tree and has no earlier revision")
+
+    rev = revs[1]
+    source = show(rev)
+
+  return rev, source
+
+#---------------------------------------
+# Gas of every step of a mint / list / buy / withdraw round on a fresh deployment
+#---------------------------------------
+def workload(chain, abi, bytecode):
+  owner, buyer = chain.accounts[0], chain.accounts[1]
+  functions = {item['name'] for item in abi if item.get('type') == 'function'}
+  gas = {}
+
+  nft, receipt = chain.deploy(abi, bytecode, 'Bench', 'BNCH', sender=owner)
+  gas['deploy'] = receipt.gasUsed
+
+  # steps calling a function an older contract does not have are left out of its report
+  def step(name, fn, *args, sender = owner, value = 0):
+    if fn not in functions:
+      return False
+
+    gas[name] = chain.transact(nft, fn, *args, sender=sender, value=value).gasUsed
+    return True
+
+  # token ids 1 and 2, then 3 to 5
+  step('mint', 'mint', owner, 5, 'ipfs://bench/1.json')
+  step('mintNoUri', 'mint', owner, 5, '')
+
+  if not step('mintBatch3', 'mintBatch', owner, [5, 5, 5], []):
+    # the same tokens one at a time, not measured
+    for _ in range(3):
+      chain.transact(nft, 'mint', owner, 5, '', sender=owner)
+
+  # the first listing of a seller also approves the contract
+  step('addListingFirst', 'addListing', nft.address, price, 1)
+  step('addListing', 'addListing', nft.address, price, 2)
+  step('purchase', 'purchase', nft.address, 2, 1, price * 2, sender=buyer, value=price * 2)
+
+  step('addListing3', 'addListing', nft.address, price, 3)
+  step('addListing4', 'addListing', nft.address, price, 4)
+  step('purchaseBatch2', 'purchaseBatch', nft.address, [1, 1], [3, 4], price * 2, sender=buyer, value=price * 2)
+
+  step('withdraw', 'withdraw', 0)
+
+  return gas
+
+def main():
+  parser = argparse.ArgumentParser(description='Gas used per operation by an older revision of contracts/ERC1155.sol and the working tree')
+  parser.add_argument('-r', '--rev', default=packedBefore, help=f'git revision of the old contract, {packedBefore} (before the packed listings) by default')
+  parser.add_argument('-u', '--url', default=None, help='dev node with unlocked accounts, in-process eth-tester by default')
+  parser.add_argument('-o', '--output', default=None, help='write the JSON report here as well')
+  args = parser.parse_args()
+
+  sys.path.insert(0, root)
+  from devChain import DevChain
+  from NFTTrade import NFTTrade
+
+  with open(os.path.join(root, contract)) as fp:
+    current = fp.read()
+
+  rev, previous = oldSource(args.rev, current)
+  chain = DevChain(args.url)
+
+  report = {'old': {}, 'new': {}, 'delta': {}, 'rev': rev}
+
+  for version, source in (('old', previous), ('new', current)):
+    abi, bytecode = DevChain.compile(source, NFTTrade.solcSettings)
+    report[version] = workload(chain, abi, bytecode)
+
+  print(f"{'operation':<16}{'old':>10}{'new':>10}{'delta':>10}{'%':>8}")
+
+  for op, new in report['new'].items():
+    old = report['old'].get(op)
+
+    if old is None:
+      print(f"{op:<16}{'-':>10}{new:>10}")
+      continue
+
+    report['delta'][op] = new - old
+
+    print(f"{op:<16}{old:>10}{new:>10}{new - old:>+10}{(new - old) / old * 100:>+8.1f}")
+
+  if args.output:
+    with open(args.output, 'w') as fp:
+      json.dump(report, fp, indent=2)
+
+  print(json.dumps(report))
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,208 @@
+
+# import python modules
+import os, json, base64, hashlib, threading
+
+# go-ipfs importer defaults: fixed 256KiB chunks in a balanced DAG of 174 links per node
+CHUNK_SIZE = 262144
+MAX_LINKS = 174
+
+BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+
+#---------------------------------------
+# Protobuf and multiformat helpers
+#---------------------------------------
+def varint(value):
+    out = bytearray()
+
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+def pbBytes(fieldNum, payload):
+    return varint(fieldNum << 3 | 2) + varint(len(payload)) + payload
+
+def pbVarint(fieldNum, value):
+    return varint(fieldNum << 3) + varint(value)
+
+def base58(data):
+    number = int.from_bytes(data, 'big')
+    out = ''
+
+    while number:
+        number, rem = divmod(number, 58)
+        out = BASE58_ALPHABET[rem] + out
+
+    # leading zero bytes are kept as leading '1's
+    padding = len(data) - len(data.lstrip(b'\0'))
+
+    return '1' * padding + out
+
+# CIDv0 string of a sha2-256 multihash
+def cidV0(multihash):
+    return base58(multihash)
+
+# CIDv1 (dag-pb, base32) string of a sha2-256 multihash
+def cidV1(multihash):
+    raw = varint(1) + varint(0x70) + multihash
+
+    return 'b' + base64.b32encode(raw).decode('ascii').lower().rstrip('=')
+
+# dag-pb block of a UnixFS node: links first, then the UnixFS data
+def dagNode(unixfsData, links = ()):
+    block = b''
+
+    for multihash, name, tsize in links:
+        block += pbBytes(2, pbBytes(1, multihash) + pbBytes(2, name.encode('utf-8')) + pbVarint(3, tsize))
+
+    return block + pbBytes(1, unixfsData)
+
+# (multihash, cumulative size) of a dag-pb block
+def hashBlock(block, childSizes = 0):
+    return b'\x12\x20' + hashlib.sha256(block).digest(), len(block) + childSizes
+
+#---------------------------------------
+# Local UnixFS CID computation
+#---------------------------------------
+def leafNode(chunk):
+    data = pbVarint(1, 2)
+    if chunk:
+        data += pbBytes(2, chunk)
+    data += pbVarint(3, len(chunk))
+
+    multihash, tsize = hashBlock(dagNode(data))
+
+    return multihash, tsize, len(chunk)
+
+def parentNode(children):
+    fileSize = sum(child[2] for child in children)
+
+    data = pbVarint(1, 2) + pbVarint(3, fileSize)
+    for child in children:
+        data += pbVarint(4, child[2])
+
+    links = [(child[0], '', child[1]) for child in children]
+    multihash, tsize = hashBlock(dagNode(data, links), sum(child[1] for child in children))
+
+    return multihash, tsize, fileSize
+
+# (multihash, cumulative size) of `path` as `ipfs add` would import it, in constant memory
+def fileHash(path, chunkSize = CHUNK_SIZE):
+    # levels[n] holds the finished nodes of depth n not yet attached to a parent
+    levels = [[]]
+
+    with open(path, 'rb') as fp:
+        while True:
+            chunk = fp.read(chunkSize)
+
+            if not chunk and (levels[0] or len(levels) > 1):
+                break
+
+            levels[0].append(leafNode(chunk))
+
+            # a full level collapses into one node of the level above
+            depth = 0
+            while len(levels[depth]) == MAX_LINKS:
+                if depth + 1 == len(levels):
+                    levels.append([])
+
+                levels[depth + 1].append(parentNode(levels[depth]))
+                levels[depth] = []
+                depth += 1
+
+            if not chunk:
+                break
+
+    # close the partial nodes bottom up until a single root remains
+    depth = 0
+    while True:
+        top = depth == len(levels) - 1
+
+        if top and len(levels[depth]) == 1:
+            root = levels[depth][0]
+            return root[0], root[1]
+
+        if levels[depth]:
+            if top:
+                levels.append([])
+
+            levels[depth + 1].append(parentNode(levels[depth]))
+            levels[depth] = []
+
+        depth += 1
+
+# (multihash, cumulative size) of a directory holding a single named entry
+def wrapHash(multihash, name, tsize):
+    return hashBlock(dagNode(pbVarint(1, 1), [(multihash, name, tsize)]), tsize)
+
+#---------------------------------------
+# Local index of what has been pinned
+#---------------------------------------
+class PinIndex:
+
+    # main init function
+    def __init__(self, indexPath = '.ipfs-index.json'):
+        self.indexPath = indexPath
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        if os.path.exists(indexPath):
+            with open(indexPath) as fp:
+                self.entries = json.load(fp)
+
+        # content CID -> IPFS path, for files that moved or are duplicated
+        self.byCid = {}
+        for entry in self.entries.values():
+            self.byCid[entry['cid']] = entry['uri']
+
+    # IPFS path of `path` if it was pinned and has not changed since
+    def lookup(self, path):
+        stat = os.stat(path)
+
+        with self.lock:
+            entry = self.entries.get(os.path.abspath(path))
+
+        if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime:
+            return entry['uri']
+
+        return None
+
+    # content CIDs of `path`: the file itself and the directory wrapping it under its name
+    @staticmethod
+    def cids(path):
+        multihash, tsize = fileHash(path)
+        wrapped, wrappedSize = wrapHash(multihash, os.path.basename(path), tsize)
+
+        return cidV0(multihash), cidV0(wrapped)
+
+    # IPFS path already pinned for the same content, if any
+    def known(self, cid):
+        with self.lock:
+            return self.byCid.get(cid)
+
+    def record(self, path, cid, uri):
+        stat = os.stat(path)
+
+        with self.lock:
+            self.entries[os.path.abspath(path)] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'cid': cid,
+                'uri': uri,
+            }
+            self.byCid[cid] = uri
+
+    # write the index atomically
+    def save(self):
+        with self.lock:
+            tmpPath = f"{self.indexPath}.{os.getpid()}.tmp"
+
+            with open(tmpPath, 'w') as fp:
+                json.dump(self.entries, fp)
+
+            os.replace(tmpPath, self.indexPath)
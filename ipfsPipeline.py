@@ -0,0 +1,158 @@
+
+# import python modules
+import os, json, time, random, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from mainStream import focal
+
+#---------------------------------------
+# Concurrent pinning of an asset directory through Pinata
+#---------------------------------------
+class PinPipeline:
+
+    # main init function
+    def __init__(self, pinata, workers = 8, retries = 5, backoff = 1.0, index = None):
+        self.pinata = pinata
+        self.index = index
+        self.workers = workers
+        self.retries = retries
+        self.backoff = backoff
+
+        # a rate limit hit by one worker pauses all of them
+        self.pausedUntil = 0
+        self.lock = threading.Lock()
+
+    # every file below `root`, in a stable order
+    @staticmethod
+    def walk(root):
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames.sort()
+
+            for filename in sorted(filenames):
+                if not filename.startswith('.'):
+                    yield os.path.join(dirpath, filename)
+
+    # wait out a rate limit announced by any worker
+    def throttle(self):
+        with self.lock:
+            delay = self.pausedUntil - time.monotonic()
+
+        if delay > 0:
+            time.sleep(delay)
+
+    def pause(self, delay):
+        with self.lock:
+            self.pausedUntil = max(self.pausedUntil, time.monotonic() + delay)
+
+    # "<cid>/<basename>" of `path` if its content is already pinned under its name, checked locally before asking Pinata
+    # only the directory wrapping the file has that shape, content pinned as a bare file is uploaded again
+    def pinned(self, path):
+        uri = self.index.lookup(path)
+        if uri:
+            return uri, None
+
+        fileCid, wrappedCid = self.index.cids(path)
+        uri = self.index.known(wrappedCid)
+
+        if uri is None:
+            self.throttle()
+
+            try:
+                listed = self.pinata.pin_list({'hashContains': wrappedCid, 'status': 'pinned'})
+            except Exception:
+                listed = {}
+
+            if listed.get('count'):
+                uri = wrappedCid + '/' + os.path.basename(path)
+
+        if uri:
+            self.index.record(path, wrappedCid, uri)
+            return uri, None
+
+        return None, (fileCid, wrappedCid)
+
+    # pin one file unless its content is already pinned; returns "<cid>/<basename>"
+    def pinFile(self, path):
+        cids = None
+
+        if self.index is not None:
+            uri, cids = self.pinned(path)
+
+            if uri:
+                focal.logger.debug("Skipping %s, already pinned as %s", path, uri)
+                return uri
+
+        uri = self.upload(path)
+
+        if self.index is not None:
+            cid = uri.split('/', 1)[0]
+            self.index.record(path, cid, uri)
+
+            if cids and cid not in cids:
+                focal.logger.debug("Local CIDs %s of %s differ from the pinned %s", cids, path, cid)
+
+        return uri
+
+    # upload one file, retrying failures with exponential backoff; a request Pinata refuses (4xx but 429) is not retried
+    def upload(self, path):
+        error = None
+
+        for attempt in range(self.retries + 1):
+            self.throttle()
+
+            try:
+                result = self.pinata.pin_file_to_ipfs(path)
+            except Exception as e:
+                result = {'reason': str(e)}
+
+            if result.get('IpfsHash'):
+                return result['IpfsHash'] + '/' + os.path.basename(path)
+
+            error = result.get('reason') or result.get('text') or result
+            status = result.get('status')
+
+            if isinstance(status, int) and 400 <= status < 500 and status != 429:
+                break
+
+            delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+
+            if result.get('status') == 429:
+                self.pause(delay)
+
+            focal.logger.debug("Pinning %s failed (attempt %d): %s", path, attempt + 1, error)
+            time.sleep(delay)
+
+        raise RuntimeError(f"Unable to pin {path}: {error}")
+
+    # pin every file below `root` and write a path -> IPFS path manifest
+    def pinDirectory(self, root, manifestPath):
+        paths = list(self.walk(root))
+        manifest = {}
+        failed = {}
+
+        focal.logger.info(f"Pinning {len(paths)} files from {root} with {self.workers} workers")
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self.pinFile, path): path for path in paths}
+
+            for done, future in enumerate(as_completed(futures), 1):
+                relPath = os.path.relpath(futures[future], root)
+
+                try:
+                    manifest[relPath] = future.result()
+                except Exception as e:
+                    failed[relPath] = str(e)
+                    focal.logger.error(str(e))
+
+                if done % 100 == 0:
+                    focal.logger.info("Pinned %d of %d files", done, len(paths))
+
+        if self.index is not None:
+            self.index.save()
+
+        with open(manifestPath, 'w') as fp:
+            json.dump(dict(sorted(manifest.items())), fp, indent=2)
+
+        focal.logger.info(f"Pinned {len(manifest)} of {len(paths)} files, manifest written to {manifestPath}")
+
+        return manifest, failed
@@ -9,20 +9,62 @@
 # --------------------------------------------
 
 # import python modules
-import os, sys, glob, time, requests, json
-import logging, sched, argparse, atexit
+import os, json
+import logging, atexit, queue
+import logging.handlers
 import subprocess, threading
 # , yaml
-from datetime import datetime
-from datetime import timedelta
 from datetime import date
 import configparser, base64
-from concurrent.futures import ProcessPoolExecutor
-from concurrent.futures import ThreadPoolExecutor
-from concurrent import futures
 
 # import mysql.connector
 
+#---------------------------------------
+# Queue handler that leaves formatting to the listener thread
+#---------------------------------------
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+
+  # arguments that cannot change before the listener formats them
+  immutable = (str, bytes, int, float, bool, type(None))
+
+  # the stock handler formats every message in the calling thread; only those with a mutable argument are rendered here
+  def prepare(self, record):
+    # a lone dict argument is the args themselves, and may change
+    args = record.args
+
+    if not isinstance(record.msg, str) or isinstance(args, dict) or not all(isinstance(value, self.immutable) for value in args or ()):
+      record.msg = record.getMessage()
+      record.args = None
+
+    return record
+
+#---------------------------------------
+# Memory handler that is also flushed every `interval` seconds, so a quiet process does not hold its log back
+#---------------------------------------
+class TimedMemoryHandler(logging.handlers.MemoryHandler):
+
+  def __init__(self, capacity, interval, **kwargs):
+    super().__init__(capacity, **kwargs)
+    self.interval = interval
+    self.stopped = threading.Event()
+
+    if interval > 0:
+      threading.Thread(target=self.flushEvery, name='log-flush', daemon=True).start()
+
+  def flushEvery(self):
+    while not self.stopped.wait(self.interval):
+      self.flush()
+
+  # the stock handler flushes into its target but leaves it open
+  def close(self):
+    self.stopped.set()
+    target = self.target
+
+    super().close()
+
+    if target is not None:
+      target.close()
+
 class MainStream:
 
   """docstring for ClassName"""
@@ -32,6 +74,10 @@ class MainStream:
     self.propertyfile = "env.yaml"
     self.showLog = log
     self.logDir = 'node-logs' if not logDir else logDir
+    # open writeLog files, kept until exit instead of reopened per message
+    self.logFiles = {}
+    self.logFilesLock = threading.Lock()
+    self.listener = None
 
     self.logger = self.configLogger()
 
@@ -67,20 +113,45 @@ class MainStream:
   # Write log in custom file
   #---------------------------------------
   def writeLog(self, file, message, namedir = "", mode = "a"):
-    loc = os.path.dirname(os.path.realpath(__file__))
-
     logDir = self.logDir
     if namedir != "":
       logDir = f"{self.logDir}/{namedir}"
 
-    if not os.path.exists( logDir ):
-       os.makedirs( logDir )
-    
-    # creating/opening a file
-    f = open(f"{logDir}/{file}", mode)
-    f.write(message)
-    f.write("\n")
-    f.close()
+    path = f"{logDir}/{file}"
+
+    with self.logFilesLock:
+      f = self.logFiles.get(path)
+
+      # "w" truncates like before, later appends go to the same open file
+      if f is None or mode != "a":
+        if f is not None:
+          f.close()
+
+        if not os.path.exists( logDir ):
+          os.makedirs( logDir )
+
+        f = open(path, mode, buffering=65536)
+        self.logFiles[path] = f
+
+        if len(self.logFiles) == 1:
+          atexit.register(self.closeLogs)
+
+      f.write(message)
+      f.write("\n")
+
+  #---------------------------------------
+  # Flush the writeLog files and stop the log listener
+  #---------------------------------------
+  def closeLogs(self):
+    with self.logFilesLock:
+      for f in self.logFiles.values():
+        f.close()
+
+      self.logFiles = {}
+
+    if self.listener is not None:
+      self.listener.stop()
+      self.listener = None
 
   #---------------------------------------
   # get config values from config file
@@ -182,6 +253,8 @@ class MainStream:
 
     logname = f"{self.logDir}/{date.today().strftime('%Y%m%d')}-output"
 
+    handlers = []
+
     if self.showLog:
       # Create handlers, formatters and add it to handlers
       # CLI logger
@@ -189,14 +262,47 @@ class MainStream:
       chandler.setLevel(logging.INFO)
       cformat = logging.Formatter('[%(levelname)s] %(asctime)s: %(message)s', datefmt="%d-%m-%Y %H:%M:%S")
       chandler.setFormatter(cformat)
-      logger.addHandler(chandler)
-
-    # file logger
-    fhandler = logging.FileHandler(f'{logname}.log')
+      handlers.append(chandler)
+
+    # file logger, rotated by size and written in batches
+    fhandler = logging.handlers.RotatingFileHandler(
+      f'{logname}.log',
+      maxBytes=int(os.getenv('LOG_MAX_BYTES', 50 * 1024 * 1024)),
+      backupCount=int(os.getenv('LOG_BACKUPS', 5)),
+      delay=True
+    )
     fhandler.setLevel(logging.DEBUG)
     fformat = logging.Formatter('[%(name)s] %(asctime)s - %(levelname)s: %(message)s', datefmt="%d-%m-%Y %H:%M:%S")
     fhandler.setFormatter(fformat)
-    logger.addHandler(fhandler)
+
+    # errors are written straight away, everything else once `LOG_BUFFER` records are pending or `LOG_FLUSH_INTERVAL` seconds passed
+    bhandler = TimedMemoryHandler(
+      int(os.getenv('LOG_BUFFER', 256)),
+      float(os.getenv('LOG_FLUSH_INTERVAL', 2)),
+      flushLevel=logging.ERROR,
+      target=fhandler
+    )
+    bhandler.setLevel(logging.DEBUG)
+    handlers.append(bhandler)
+
+    if os.getenv('LOG_QUEUE', 'on') == 'off':
+      for handler in handlers:
+        logger.addHandler(handler)
+
+      atexit.register(bhandler.close)
+
+      return logger
+
+    # callers only enqueue the record, a listener thread formats and writes it
+    logQueue = queue.SimpleQueue()
+    logger.addHandler(DeferredQueueHandler(logQueue))
+
+    self.listener = logging.handlers.QueueListener(logQueue, *handlers, respect_handler_level=True)
+    self.listener.start()
+
+    # drain the queue, then flush the buffered file handler
+    atexit.register(bhandler.close)
+    atexit.register(self.closeLogs)
 
     return logger
 
@@ -249,4 +355,33 @@ class MainStream:
     
     return False
 
-focal = MainStream()
+#---------------------------------------
+# Stands in for the MainStream instance, built on first use
+#---------------------------------------
+class LazyStream:
+
+  def __init__(self, factory):
+    object.__setattr__(self, '_factory', factory)
+    object.__setattr__(self, '_stream', None)
+    object.__setattr__(self, '_lock', threading.Lock())
+
+  # the real instance; log directory, handlers and listener thread are only set up here
+  def _instance(self):
+    stream = self._stream
+
+    if stream is None:
+      with self._lock:
+        if self._stream is None:
+          object.__setattr__(self, '_stream', self._factory())
+
+        stream = self._stream
+
+    return stream
+
+  def __getattr__(self, name):
+    return getattr(self._instance(), name)
+
+  def __setattr__(self, name, value):
+    setattr(self._instance(), name, value)
+
+focal = LazyStream(MainStream)
@@ -0,0 +1,183 @@
+
+# import python modules
+import os, csv, json, sqlite3
+
+from mainStream import focal
+
+#---------------------------------------
+# (path, IPFS path) pairs of a pinning manifest, a flat JSON object of strings, read in `chunkSize` pieces
+#---------------------------------------
+def manifestItems(manifestPath, chunkSize = 65536):
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    expect, key = '{', None
+
+    with open(manifestPath) as fp:
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError(f"{manifestPath} ends before its closing brace")
+
+                buffer, pos = fp.read(chunkSize), 0
+                eof = not buffer
+                continue
+
+            char = buffer[pos]
+
+            if expect == '{' and char == '{':
+                expect = 'key'
+                pos += 1
+            elif expect in ('key', 'next') and char == '}':
+                return
+            elif expect == 'next' and char == ',':
+                expect = 'key'
+                pos += 1
+            elif expect in ('key', 'value') and char == '"':
+                try:
+                    text, end = decoder.raw_decode(buffer, pos)
+                except ValueError:
+                    # the string runs past what was read so far
+                    if eof:
+                        raise
+
+                    more = fp.read(chunkSize)
+                    eof = not more
+                    buffer, pos = buffer[pos:] + more, 0
+                    continue
+
+                pos = end
+
+                if expect == 'key':
+                    key, expect = text, ':'
+                else:
+                    yield key, text
+                    expect = 'next'
+            elif expect == ':' and char == ':':
+                expect = 'value'
+                pos += 1
+            else:
+                raise ValueError(f"{manifestPath} is not a path to IPFS path manifest, unexpected {char!r}")
+
+#---------------------------------------
+# Path to IPFS path lookups of a pinning manifest, kept in a temporary SQLite file instead of memory
+#---------------------------------------
+class CidMap:
+
+    # main init function
+    def __init__(self, manifestPath, batchSize = 10000):
+        # an empty name is a private on-disk database, removed when it is closed
+        self.db = sqlite3.connect('')
+        self.db.execute('CREATE TABLE cids (path TEXT PRIMARY KEY, uri TEXT)')
+
+        batch = []
+        for item in manifestItems(manifestPath):
+            batch.append(item)
+
+            if len(batch) == batchSize:
+                self.db.executemany('INSERT OR REPLACE INTO cids VALUES (?, ?)', batch)
+                batch = []
+
+        self.db.executemany('INSERT OR REPLACE INTO cids VALUES (?, ?)', batch)
+        self.db.commit()
+
+    def get(self, path):
+        row = self.db.execute('SELECT uri FROM cids WHERE path = ?', (path,)).fetchone()
+
+        return row[0] if row else None
+
+    def close(self):
+        self.db.close()
+
+#---------------------------------------
+# Streaming metadata generation from a traits file
+#---------------------------------------
+class MetadataGenerator:
+
+    # columns that are not attributes
+    reserved = ('token_id', 'name', 'description', 'image')
+
+    # main init function
+    def __init__(self, cidMap, outDir = 'metadata', hexIds = False):
+        self.outDir = outDir
+        self.hexIds = hexIds
+
+        # asset path -> "<cid>/<basename>", as written by the pinning manifest
+        self.cidMap = CidMap(cidMap)
+
+    # rows of a CSV or JSONL traits file, one at a time
+    @staticmethod
+    def rows(traitsPath):
+        with open(traitsPath, newline='') as fp:
+            if traitsPath.endswith('.csv'):
+                for row in csv.DictReader(fp):
+                    yield row
+            else:
+                for line in fp:
+                    line = line.strip()
+                    if line:
+                        yield json.loads(line)
+
+    # "ipfs://..." image of a row, resolved through the path to CID mapping
+    def image(self, value):
+        if value.startswith('ipfs://'):
+            return value
+
+        uri = self.cidMap.get(value) or self.cidMap.get(os.path.normpath(value))
+        if uri is None:
+            raise KeyError(f"No CID for image '{value}'")
+
+        return f"ipfs://{uri}"
+
+    # metadata document of one row, in the layout of NFTTrade.convertMetadata
+    def document(self, row):
+        attributes = row.get('attributes') or []
+
+        if isinstance(attributes, dict):
+            attributes = [ {'trait_type': key, 'value': value} for key, value in attributes.items() ]
+
+        # every other non-empty column is a trait
+        for key, value in row.items():
+            if key in self.reserved or key == 'attributes' or value in (None, ''):
+                continue
+
+            attributes.append({'trait_type': key, 'value': value})
+
+        return {
+            "attributes": attributes,
+            "description": row.get('description', ''),
+            "image": self.image(str(row['image'])),
+            "name": row.get('name', '')
+        }
+
+    # file name of a token, hex ids match the client side `{id}` substitution of ERC1155
+    def fileName(self, tokenId):
+        tokenId = int(tokenId)
+
+        return f"{tokenId:064x}.json" if self.hexIds else f"{tokenId}.json"
+
+    # write one `<token_id>.json` per row; returns (written, failed)
+    def generate(self, traitsPath):
+        if not os.path.exists(self.outDir):
+            os.makedirs(self.outDir)
+
+        written = 0
+        failed = 0
+
+        for line, row in enumerate(self.rows(traitsPath), 1):
+            try:
+                document = self.document(row)
+
+                with open(os.path.join(self.outDir, self.fileName(row['token_id'])), 'w') as fp:
+                    json.dump(document, fp)
+
+                written += 1
+            except Exception as e:
+                failed += 1
+                focal.logger.error(f"Row {line} of {traitsPath}: {e!r}")
+
+        focal.logger.info(f"Created {written} metadata files in {self.outDir}, {failed} rows failed")
+
+        return written, failed
@@ -0,0 +1,308 @@
+# import python modules
+import os, hmac, json, time, uuid, threading, itertools
+import socketserver
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mainStream import focal
+
+#---------------------------------------
+# JSON body of a response: receipts hold HexBytes and AttributeDicts
+#---------------------------------------
+def jsonValue(value):
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+
+    if hasattr(value, 'items'):
+        return dict(value.items())
+
+    return str(value)
+
+# Host headers of the loopback interface; any other name may be a DNS rebinding page in a browser
+localHosts = ('localhost', '127.0.0.1', '[::1]')
+
+#---------------------------------------
+# HTTP requests of the daemon: POST /<op> queues, GET /jobs/<id> polls
+#---------------------------------------
+class DaemonHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    # unix socket peers have no address
+    def address_string(self):
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        focal.logger.debug("%s %s", self.address_string(), format % args)
+
+    def reply(self, status, body):
+        data = json.dumps(body, default=jsonValue).encode()
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    # (status, error) of a request the daemon must not act on, None when it may
+    def refused(self):
+        daemon = self.server.nftDaemon
+
+        host = (self.headers.get('Host') or '').lower()
+        host = host[:host.index(']') + 1] if host.startswith('[') and ']' in host else host.split(':')[0]
+
+        if host not in daemon.hosts:
+            return 403, f"host {host or '(none)'} is not allowed"
+
+        if not hmac.compare_digest(self.headers.get('Authorization') or '', f"Bearer {daemon.token}"):
+            return 401, 'missing or wrong bearer token'
+
+        # browsers send a cross-origin form or text/plain body without asking, never application/json
+        if self.command == 'POST' and (self.headers.get('Content-Type') or '').split(';')[0].strip().lower() != 'application/json':
+            return 415, 'Content-Type must be application/json'
+
+        return None
+
+    def do_GET(self):
+        daemon = self.server.nftDaemon
+
+        refused = self.refused()
+        if refused:
+            return self.reply(refused[0], {'error': refused[1]})
+
+        if self.path == '/health':
+            return self.reply(200, daemon.health())
+
+        if self.path.startswith('/jobs/'):
+            job = daemon.job(self.path[len('/jobs/'):])
+
+            if job is None:
+                return self.reply(404, {'error': 'unknown job'})
+
+            return self.reply(200, job)
+
+        self.reply(404, {'error': f"unknown path {self.path}"})
+
+    def do_POST(self):
+        daemon = self.server.nftDaemon
+        op = self.path.strip('/')
+
+        refused = self.refused()
+        if refused:
+            return self.reply(refused[0], {'error': refused[1]})
+
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            params = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError as e:
+            return self.reply(400, {'error': f"invalid JSON body: {e}"})
+
+        try:
+            job = daemon.submit(op, params)
+        except KeyError as e:
+            return self.reply(404 if op not in daemon.trade.operations else 400, {'error': e.args[0]})
+        except ValueError as e:
+            return self.reply(400, {'error': str(e)})
+        except OverflowError as e:
+            return self.reply(503, {'error': str(e)})
+
+        # `"wait": true` holds the response until the transaction is mined
+        if params.get('wait'):
+            daemon.wait(job['id'])
+            return self.reply(200, daemon.job(job['id']))
+
+        self.reply(202, job)
+
+class DaemonHTTPServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+class DaemonUnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+
+    daemon_threads = True
+
+#---------------------------------------
+# Resident process keeping the ABI, Web3 session, nonces and fees warm between requests
+#---------------------------------------
+class NFTDaemon:
+
+    # main init function
+    def __init__(self, trade, executor, token, keepJobs = 10000, fillAfter = 5.0):
+        self.trade = trade
+        self.executor = executor
+        # every request carries it as `Authorization: Bearer <token>`
+        self.token = token
+        self.keepJobs = keepJobs
+        self.hosts = localHosts
+        # seconds a nonce handed back by a failed send may wait to be reused before it is filled with a no-op
+        self.fillAfter = fillAfter
+
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counter = itertools.count(1)
+
+        # job id -> job, in submission order so the oldest finished ones can be dropped
+        self.jobs = {}
+        self.futures = {}
+
+    # everything the first request would otherwise pay for
+    def warmUp(self):
+        abi, bytecode = self.trade.compileSol()
+
+        self.trade.web3.eth.chain_id
+        self.trade.gasOracle.fees()
+        # stores the count, so the first request allocates without asking the node
+        self.trade.nonces.resync()
+
+        focal.logger.info(f"Daemon warm: {len(abi)} ABI entries, wallet {self.trade.fromAddr}")
+
+    # a failed send leaves a gap the jobs after it wait behind, unless a later job takes the nonce
+    def fillGaps(self):
+        while True:
+            time.sleep(self.fillAfter)
+
+            try:
+                self.trade.fillReleased(self.fillAfter)
+            except Exception as e:
+                focal.logger.warning("Nonce gaps not filled: %s", e)
+
+    def queued(self):
+        return sum(1 for job in self.jobs.values() if job['status'] in ('queued', 'running'))
+
+    def health(self):
+        with self.lock:
+            return {
+                'uptime': round(time.time() - self.started, 1),
+                'queued': self.queued(),
+                'jobs': len(self.jobs),
+                'limits': self.executor.stats(),
+            }
+
+    # queue `op` with its request parameters; returns the job
+    def submit(self, op, params):
+        func, args = self.trade.operation(op, params)
+
+        job = {
+            'id': f"{next(self.counter)}-{uuid.uuid4().hex[:8]}",
+            'op': op,
+            'args': args,
+            'status': 'queued',
+            'submitted': time.time(),
+        }
+
+        # a full executor refuses the job instead of queueing without bound
+        future = self.executor.submit(self.call, (job, func, args), self.trade.fromAddr, self.trade.chain.endpoint, block=False)
+
+        with self.lock:
+            self.jobs[job['id']] = job
+            self.futures[job['id']] = future
+            self.prune()
+
+            snapshot = dict(job)
+
+        future.add_done_callback(lambda future: self.finish(job, future))
+
+        return snapshot
+
+    # runs on an executor worker; errors propagate so pushback is retried there
+    def call(self, job, func, args):
+        with self.lock:
+            job['status'] = 'running'
+
+        return func(*args)
+
+    def finish(self, job, future):
+        try:
+            receipt = future.result()
+            status = 'mined' if receipt and receipt.get('status') == 1 else 'failed'
+            result = dict(receipt) if receipt else None
+            error = None if receipt else 'transaction was not sent, see the log'
+        except Exception as e:
+            status, result, error = 'failed', None, repr(e)
+
+        with self.lock:
+            job.update(status=status, result=result, finished=time.time())
+            if error:
+                job['error'] = error
+
+            self.futures.pop(job['id'], None)
+
+    def job(self, jobId):
+        with self.lock:
+            job = self.jobs.get(jobId)
+
+            return dict(job) if job else None
+
+    def wait(self, jobId):
+        with self.lock:
+            future = self.futures.get(jobId)
+
+        if future is not None:
+            try:
+                future.result()
+            except Exception:
+                pass
+
+        # the done callback may still be filling in the job
+        while True:
+            job = self.job(jobId)
+
+            if job is None or job['status'] in ('mined', 'failed'):
+                return job
+
+            time.sleep(0.01)
+
+    # forget the oldest finished jobs beyond `keepJobs`
+    def prune(self):
+        excess = len(self.jobs) - self.keepJobs
+
+        for jobId in list(self.jobs):
+            if excess <= 0:
+                break
+
+            if self.jobs[jobId]['status'] in ('mined', 'failed'):
+                del self.jobs[jobId]
+                excess -= 1
+
+    # serve on a unix socket when `socketPath` is given, on host:port otherwise
+    def serve(self, host = '127.0.0.1', port = 8645, socketPath = None):
+        if not self.token:
+            raise ValueError("DAEMON_TOKEN is not set, the daemon does not run without a bearer token")
+
+        self.warmUp()
+
+        threading.Thread(target=self.fillGaps, name='nonce-gaps', daemon=True).start()
+
+        if socketPath:
+            if os.path.exists(socketPath):
+                os.unlink(socketPath)
+
+            # only the owner may drive the wallet: the socket is created 0600, there is no window before a chmod
+            umask = os.umask(0o177)
+            try:
+                server = DaemonUnixServer(socketPath, DaemonHandler)
+            finally:
+                os.umask(umask)
+
+            where = socketPath
+        else:
+            # a daemon bound to another address is also reached by that name
+            if host.lower() not in localHosts + ('0.0.0.0', '::', ''):
+                self.hosts = localHosts + (f"[{host.lower()}]" if ':' in host else host.lower(),)
+
+            server = DaemonHTTPServer((host, port), DaemonHandler)
+            where = f"http://{host}:{port}"
+
+        server.nftDaemon = self
+
+        focal.logger.info(f"Daemon listening on {where}")
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.executor.shutdown(wait=True)
+
+            if socketPath and os.path.exists(socketPath):
+                os.unlink(socketPath)
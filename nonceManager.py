@@ -0,0 +1,138 @@
+
+# import python modules
+import heapq, time, threading
+from web3 import Web3
+
+#---------------------------------------
+# Local nonce allocation per wallet
+#---------------------------------------
+class NonceManager:
+
+    # one manager per wallet per process
+    managers = {}
+    managersLock = threading.Lock()
+
+    # node error messages meaning another transaction already holds the nonce
+    staleErrors = (
+        'nonce too low',
+        'replacement transaction underpriced',
+    )
+
+    # node error messages meaning this very transaction is already in the pool and will be mined
+    knownErrors = (
+        'already known',
+        'known transaction',
+    )
+
+    # main init function
+    def __init__(self, web3, address):
+        self.web3 = web3
+        self.address = Web3.toChecksumAddress(address)
+        self.lock = threading.Lock()
+
+        # next never-used nonce, None until the first sync
+        self.nextNonce = None
+        # nonces handed back by transactions that never reached the node, and when
+        self.released = []
+        self.releasedAt = {}
+
+    # shared manager for `address`
+    @classmethod
+    def get(cls, web3, address):
+        address = Web3.toChecksumAddress(address)
+
+        with cls.managersLock:
+            manager = cls.managers.get(address)
+
+            if manager is None:
+                manager = cls(web3, address)
+                cls.managers[address] = manager
+
+        return manager
+
+    # true if `err` says the nonce was used by another transaction
+    @classmethod
+    def isStale(cls, err):
+        message = str(err).lower()
+
+        return any(text in message for text in cls.staleErrors)
+
+    # true if `err` says the node already has the transaction, e.g. after a retried send
+    @classmethod
+    def isKnown(cls, err):
+        message = str(err).lower()
+
+        return any(text in message for text in cls.knownErrors)
+
+    def pendingCount(self):
+        return self.web3.eth.getTransactionCount(self.address, 'pending')
+
+    # hand out the next nonce, syncing with the node only on first use
+    def allocate(self):
+        with self.lock:
+            if self.nextNonce is None:
+                self.nextNonce = self.pendingCount()
+
+            # fill gaps left by dropped transactions before moving forward
+            if self.released:
+                nonce = heapq.heappop(self.released)
+                self.releasedAt.pop(nonce, None)
+
+                return nonce
+
+            nonce = self.nextNonce
+            self.nextNonce += 1
+
+            return nonce
+
+    # return a nonce whose transaction was never accepted by the node
+    def release(self, nonce):
+        with self.lock:
+            if self.nextNonce is None:
+                return
+
+            if nonce == self.nextNonce - 1:
+                self.nextNonce -= 1
+
+                # collapse released nonces now at the top of the range
+                while self.released and max(self.released) == self.nextNonce - 1:
+                    self.released.remove(self.nextNonce - 1)
+                    heapq.heapify(self.released)
+                    self.releasedAt.pop(self.nextNonce - 1, None)
+                    self.nextNonce -= 1
+            elif nonce < self.nextNonce and nonce not in self.released:
+                heapq.heappush(self.released, nonce)
+                self.releasedAt[nonce] = time.monotonic()
+
+    # released nonces nobody took again within `idle` seconds, handed to the caller to fill;
+    # the transactions sent after them wait until something is mined at those nonces
+    def takeIdle(self, idle):
+        now = time.monotonic()
+
+        with self.lock:
+            taken = sorted(nonce for nonce in self.released if now - self.releasedAt.get(nonce, now) >= idle)
+
+            if taken:
+                self.released = [nonce for nonce in self.released if nonce not in taken]
+                heapq.heapify(self.released)
+
+                for nonce in taken:
+                    self.releasedAt.pop(nonce, None)
+
+        return taken
+
+    # catch up with the node after another sender used our nonces
+    def resync(self):
+        pending = self.pendingCount()
+
+        with self.lock:
+            # only ever forward: nonces other threads hold but have not sent yet must not be handed out again
+            if self.nextNonce is None or pending > self.nextNonce:
+                self.nextNonce = pending
+
+            # released nonces below the node's count were used by someone else
+            self.released = [nonce for nonce in self.released if nonce >= pending]
+            heapq.heapify(self.released)
+            self.releasedAt = {nonce: at for nonce, at in self.releasedAt.items() if nonce >= pending}
+
+        return pending
@@ -0,0 +1,158 @@
+# import python modules
+import time, random, threading
+from concurrent.futures import ThreadPoolExecutor
+
+#---------------------------------------
+# Raised when the node or provider refuses work because it is overloaded, only before anything reached the chain
+#---------------------------------------
+class Pushback(Exception):
+
+    # error messages of rate limited providers and full transaction pools
+    messages = (
+        '429',
+        'too many requests',
+        'rate limit',
+        'txpool is full',
+        'mempool is full',
+        'transaction pool is full',
+        'service unavailable',
+        'capacity exceeded',
+    )
+
+    # true if `err` means "slow down" rather than "this operation is wrong"
+    @classmethod
+    def matches(cls, err):
+        import requests
+
+        if isinstance(err, (cls, requests.Timeout, requests.ConnectionError)):
+            return True
+
+        message = str(err).lower()
+
+        return any(text in message for text in cls.messages)
+
+#---------------------------------------
+# Concurrency limit that halves on pushback and grows back one slot per success
+#---------------------------------------
+class Limiter:
+
+    # main init function
+    def __init__(self, limit):
+        self.ceiling = limit
+        self.limit = limit
+        self.active = 0
+        self.pausedUntil = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while True:
+                delay = self.pausedUntil - time.monotonic()
+
+                if delay > 0:
+                    self.cond.wait(delay)
+                elif self.active >= self.limit:
+                    self.cond.wait()
+                else:
+                    break
+
+            self.active += 1
+
+    def release(self, pushback = False):
+        with self.cond:
+            self.active -= 1
+
+            if pushback:
+                self.limit = max(1, self.limit // 2)
+            elif self.limit < self.ceiling:
+                self.limit += 1
+
+            self.cond.notify_all()
+
+    # hold every new operation back for `delay` seconds
+    def pause(self, delay):
+        with self.cond:
+            self.pausedUntil = max(self.pausedUntil, time.monotonic() + delay)
+
+#---------------------------------------
+# Runs independent operations concurrently, capped per wallet and per RPC endpoint
+#---------------------------------------
+class OpExecutor:
+
+    # main init function
+    def __init__(self, workers = 8, perWallet = 16, perEndpoint = 32, maxPending = 1000, retries = 5, backoff = 1.0):
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='op-worker')
+        self.perWallet = perWallet
+        self.perEndpoint = perEndpoint
+        self.retries = retries
+        self.backoff = backoff
+
+        # submitters block (or are refused) once `maxPending` operations are queued or running
+        self.maxPending = maxPending
+        self.slots = threading.BoundedSemaphore(maxPending)
+
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, kind, key):
+        with self.lock:
+            limiter = self.limiters.get((kind, key))
+
+            if limiter is None:
+                limiter = Limiter(self.perWallet if kind == 'wallet' else self.perEndpoint)
+                self.limiters[(kind, key)] = limiter
+
+        return limiter
+
+    # in-flight operations and current limit per wallet / endpoint
+    def stats(self):
+        with self.lock:
+            return {
+                f"{kind}:{key}": {'active': limiter.active, 'limit': limiter.limit}
+                for (kind, key), limiter in self.limiters.items()
+            }
+
+    # queue `func(*args)`; returns a Future. Blocks while the executor is full, or raises OverflowError without `block`
+    # `endpoint` may be a callable naming the RPC endpoint the next attempt goes to, it is asked again on every retry
+    def submit(self, func, args = (), wallet = None, endpoint = None, block = True):
+        if not self.slots.acquire(blocking=block):
+            raise OverflowError(f"{self.maxPending} operations already pending, retry later")
+
+        try:
+            future = self.pool.submit(self.run, func, args, wallet, endpoint)
+        except Exception:
+            self.slots.release()
+            raise
+
+        future.add_done_callback(lambda future: self.slots.release())
+
+        return future
+
+    # run one operation inside the wallet and endpoint limits, retrying with backoff on Pushback
+    # other errors, a timeout included, may come after a transaction was sent and are never retried: it could be sent twice
+    def run(self, func, args, wallet, endpoint):
+        for attempt in range(self.retries + 1):
+            # always taken in the same order, so two limits never wait on each other
+            limiters = [ self.limiter('wallet', wallet), self.limiter('endpoint', endpoint() if callable(endpoint) else endpoint) ]
+
+            for limiter in limiters:
+                limiter.acquire()
+
+            pushback = False
+            try:
+                return func(*args)
+            except Exception as e:
+                if attempt == self.retries or not isinstance(e, Pushback):
+                    raise
+
+                pushback = True
+            finally:
+                for limiter in reversed(limiters):
+                    limiter.release(pushback)
+
+            delay = self.backoff * (2 ** attempt) + random.uniform(0, self.backoff)
+            limiters[1].pause(delay)
+            time.sleep(delay)
+
+    def shutdown(self, wait = True):
+        self.pool.shutdown(wait=wait)
@@ -0,0 +1,146 @@
+
+# import python modules
+import os, json, threading
+
+#---------------------------------------
+# Read-only contract calls cached until a new block or event invalidates them
+#---------------------------------------
+class QueryCache:
+
+    # calls whose result can change without the contract emitting an event
+    blockScoped = ('getBalance',)
+
+    # main init function
+    def __init__(self, chain, cachePath = '.query-cache.json'):
+        self.chain = chain
+        self.cachePath = cachePath
+        self.lock = threading.Lock()
+
+        # "<chain id>:<contract address>" -> {'block': validated up to, 'hash': its block hash, 'entries': {key: value}}
+        self.state = {}
+
+        if os.path.exists(cachePath):
+            try:
+                with open(cachePath) as fp:
+                    # entries of files keyed by address alone cannot tell which chain they came from
+                    self.state = { scope: state for scope, state in json.load(fp).items() if ':' in scope }
+            except ValueError:
+                self.state = {}
+
+    @staticmethod
+    def key(fnName, args):
+        return json.dumps([fnName, list(args)])
+
+    # the same address on another network, or on a restarted dev chain, is another contract
+    def scope(self, address):
+        return f"{self.chain.chainId}:{address}"
+
+    # bring the cache of `scope` up to block `head` with hash `headHash`, dropping whatever new events or blocks invalidate;
+    # `replaced` when the validated block is no longer part of the chain
+    def validate(self, scope, head, headHash, logs, replaced = False):
+        with self.lock:
+            state = self.state.setdefault(scope, {'block': head, 'hash': headHash, 'entries': {}})
+
+            if state['block'] == head and state.get('hash') == headHash and not replaced:
+                return state
+
+            if replaced or head < state['block']:
+                # a reorg or a fresh chain, nothing read from the old blocks can be trusted
+                state['entries'] = {}
+            elif logs:
+                # something happened on the contract, every cached read of it may be stale
+                state['entries'] = {}
+            else:
+                state['entries'] = {
+                    key: value for key, value in state['entries'].items()
+                    if json.loads(key)[0] not in self.blockScoped
+                }
+
+            state['block'] = head
+            state['hash'] = headHash
+
+            return state
+
+    # results of `calls` [(fnName, args)] on `contract`, in two batched round trips at most
+    def query(self, contract, calls):
+        address = contract.address
+        scope = self.scope(address)
+
+        with self.lock:
+            known = self.state.get(scope)
+
+        batch = [('eth_getBlockByNumber', ['latest', False])]
+        if known:
+            batch.append(('eth_getLogs', [{'address': address, 'fromBlock': hex(known['block'] + 1), 'toBlock': 'latest'}]))
+            batch.append(('eth_getBlockByNumber', [hex(known['block']), False]))
+
+        replies = self.chain.rpcBatch(batch)
+
+        if isinstance(replies[0], Exception):
+            raise replies[0]
+
+        head = int(replies[0]['number'], 16)
+        headHash = replies[0]['hash']
+        logs = replies[1] if known else []
+
+        # an unanswerable log query cannot prove the cache is still valid
+        if isinstance(logs, Exception):
+            logs = [logs]
+
+        # the block the cache was validated at must still be the one on the chain
+        replaced = False
+        if known:
+            block = replies[2]
+            replaced = isinstance(block, Exception) or not block or block.get('hash') != known.get('hash')
+
+        state = self.validate(scope, head, headHash, logs, replaced)
+
+        results = {}
+        misses = []
+        for fnName, args in calls:
+            key = self.key(fnName, args)
+
+            with self.lock:
+                if key in state['entries']:
+                    results[key] = state['entries'][key]
+                else:
+                    misses.append((fnName, args, key))
+
+        if misses:
+            replies = self.chain.rpcBatch([
+                ('eth_call', [{'to': address, 'data': contract.encodeABI(fnName, args=list(args))}, hex(head)])
+                for fnName, args, key in misses
+            ])
+
+            for (fnName, args, key), reply in zip(misses, replies):
+                if isinstance(reply, Exception):
+                    raise reply
+
+                value = self.decode(contract, fnName, reply)
+                results[key] = value
+
+                with self.lock:
+                    state['entries'][key] = value
+
+            self.save()
+
+        return [ results[self.key(fnName, args)] for fnName, args in calls ]
+
+    # decode raw eth_call output with the function's ABI outputs
+    def decode(self, contract, fnName, output):
+        fnAbi = next(entry for entry in contract.abi if entry.get('type') == 'function' and entry.get('name') == fnName)
+        types = [ item['type'] for item in fnAbi['outputs'] ]
+
+        values = contract.web3.codec.decode_abi(types, bytes.fromhex(output[2:]))
+
+        return values[0] if len(values) == 1 else list(values)
+
+    # write the cache atomically so the next process starts warm
+    def save(self):
+        with self.lock:
+            tmpPath = f"{self.cachePath}.{os.getpid()}.tmp"
+
+            with open(tmpPath, 'w') as fp:
+                json.dump(self.state, fp)
+
+            os.replace(tmpPath, self.cachePath)
@@ -0,0 +1,174 @@
+
+# import python modules
+import os, time, threading
+from concurrent.futures import Future
+from web3.datastructures import AttributeDict
+
+from mainStream import focal
+
+#---------------------------------------
+# Background receipt polling for many pending transactions
+#---------------------------------------
+class ReceiptTracker:
+
+    # one tracker per chain session per process
+    trackers = {}
+    trackersLock = threading.Lock()
+
+    # receipt fields returned as hex quantities by the node
+    quantityFields = ('blockNumber', 'cumulativeGasUsed', 'gasUsed', 'status', 'transactionIndex', 'effectiveGasPrice', 'type')
+
+    # the same within each of its logs
+    logQuantityFields = ('blockNumber', 'logIndex', 'transactionIndex')
+
+    # main init function
+    def __init__(self, chain, pollInterval = 2.0, timeout = 300.0, confirmations = 1, batchSize = 100):
+        self.chain = chain
+        self.pollInterval = pollInterval
+        self.timeout = timeout
+        self.confirmations = confirmations
+        self.batchSize = batchSize
+
+        # tx hash -> (future, deadline, confirmations)
+        self.pending = {}
+        self.cond = threading.Condition()
+        self.thread = None
+
+    # shared tracker for `chain`, configured from the environment on first use
+    @classmethod
+    def get(cls, chain):
+        with cls.trackersLock:
+            tracker = cls.trackers.get(chain.apiUrl)
+
+            if tracker is None:
+                tracker = cls(
+                    chain,
+                    pollInterval = float(os.getenv('RECEIPT_POLL_INTERVAL', 2)),
+                    timeout = float(os.getenv('RECEIPT_TIMEOUT', 300)),
+                    confirmations = int(os.getenv('RECEIPT_CONFIRMATIONS', 1))
+                )
+                cls.trackers[chain.apiUrl] = tracker
+
+        return tracker
+
+    # future resolving to the receipt of `txHash` once it has enough confirmations
+    def track(self, txHash, confirmations = None, timeout = None):
+        if not isinstance(txHash, str):
+            txHash = txHash.hex()
+
+        future = Future()
+        deadline = time.monotonic() + (timeout or self.timeout)
+
+        with self.cond:
+            self.pending[txHash] = (future, deadline, confirmations or self.confirmations)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='receipt-tracker', daemon=True)
+                self.thread.start()
+
+            self.cond.notify()
+
+        return future
+
+    # forget `txHash` without resolving its future, e.g. once a replacement landed
+    def untrack(self, txHash):
+        with self.cond:
+            return self.pending.pop(txHash, None)
+
+    def run(self):
+        while True:
+            with self.cond:
+                while not self.pending:
+                    self.cond.wait()
+
+            try:
+                self.poll()
+            except Exception as e:
+                # a failed round is retried on the next tick, futures keep waiting until their deadline
+                focal.logger.debug("Receipt polling failed: %s", e)
+                self.expire()
+
+            time.sleep(self.pollInterval)
+
+    # one polling round: the head block plus every pending receipt, in batched requests
+    def poll(self):
+        with self.cond:
+            hashes = list(self.pending.keys())
+
+        now = time.monotonic()
+
+        for start in range(0, len(hashes), self.batchSize):
+            chunk = hashes[start:start + self.batchSize]
+
+            calls = [('eth_blockNumber', [])]
+            calls += [('eth_getTransactionReceipt', [txHash]) for txHash in chunk]
+
+            results = self.chain.rpcBatch(calls)
+
+            head = results[0]
+            if isinstance(head, Exception):
+                raise head
+
+            head = int(head, 16)
+
+            for txHash, receipt in zip(chunk, results[1:]):
+                with self.cond:
+                    entry = self.pending.get(txHash)
+
+                if entry is None:
+                    continue
+
+                future, deadline, confirmations = entry
+
+                if isinstance(receipt, Exception) or receipt is None:
+                    if now > deadline:
+                        self.untrack(txHash)
+                        future.set_exception(TimeoutError(f"Transaction {txHash} is not in the chain after {self.timeout} seconds"))
+                    continue
+
+                receipt = self.format(receipt)
+
+                if head - receipt['blockNumber'] + 1 < confirmations:
+                    continue
+
+                self.untrack(txHash)
+                future.set_result(receipt)
+
+    # fail every future whose deadline passed, used when the node cannot be polled at all
+    def expire(self):
+        now = time.monotonic()
+
+        with self.cond:
+            overdue = [txHash for txHash, entry in self.pending.items() if now > entry[1]]
+
+        for txHash in overdue:
+            entry = self.untrack(txHash)
+
+            if entry is not None:
+                entry[0].set_exception(TimeoutError(f"Transaction {txHash} is not in the chain after {self.timeout} seconds"))
+
+    # receipts of this tracker are not web3 receipts: quantities, in the receipt and its logs, are decoded to ints,
+    # but hashes, addresses, log data and topics stay the node's 0x hex strings, so results and journals can be
+    # JSON encoded as they are; wrap them in HexBytes where bytes are needed (see chainBench.mintedIds)
+    def format(self, receipt):
+        receipt = dict(receipt)
+
+        for field in self.quantityFields:
+            value = receipt.get(field)
+
+            if isinstance(value, str):
+                receipt[field] = int(value, 16)
+
+        logs = []
+        for log in receipt.get('logs') or []:
+            log = dict(log)
+
+            for field in self.logQuantityFields:
+                if isinstance(log.get(field), str):
+                    log[field] = int(log[field], 16)
+
+            logs.append(AttributeDict(log))
+
+        receipt['logs'] = logs
+
+        return AttributeDict(receipt)
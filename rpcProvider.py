@@ -0,0 +1,388 @@
+
+# import python modules
+import time, queue, random, threading, itertools
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from web3.providers.base import BaseProvider
+from web3.providers.eth_tester import EthereumTesterProvider
+
+from mainStream import focal
+
+#---------------------------------------
+# One JSON-RPC endpoint and what we know about its health
+#---------------------------------------
+class Endpoint:
+
+    # main init function
+    def __init__(self, url):
+        self.url = url
+        # moving average of the round trip in seconds, None until measured
+        self.latency = None
+        self.failures = 0
+        self.downUntil = 0
+
+    def observe(self, seconds):
+        self.latency = seconds if self.latency is None else 0.8 * self.latency + 0.2 * seconds
+        self.failures = 0
+        self.downUntil = 0
+
+    # take the endpoint out of rotation, for `delay` seconds or an exponential backoff
+    def fail(self, delay = None):
+        self.failures += 1
+        self.downUntil = time.monotonic() + (delay if delay is not None else min(60, 2 ** self.failures))
+
+# calls that change state: sent twice they may do it twice, or get an error for what went through the first time
+writes = ('eth_sendRawTransaction', 'eth_sendTransaction')
+
+#---------------------------------------
+# True if the request failing with `error` may have reached the node: a read timeout, a dropped connection or a server error
+#---------------------------------------
+def maybeDelivered(error):
+    from urllib3.exceptions import NewConnectionError, ConnectTimeoutError
+
+    if isinstance(error, requests.ConnectTimeout):
+        return False
+
+    if isinstance(error, requests.HTTPError):
+        return error.response is None or error.response.status_code >= 500
+
+    if isinstance(error, requests.ConnectionError):
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+
+        return not isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+    return isinstance(error, requests.Timeout)
+
+#---------------------------------------
+# Web3 provider batching concurrent calls and failing over between endpoints
+#---------------------------------------
+class BatchingProvider(BaseProvider):
+
+    # main init function
+    def __init__(self, urls, session, timeout = (5, 30), batchWindow = 0.002, maxBatch = 100, senders = 4, healthInterval = 15.0, maxLag = 5):
+        super().__init__()
+
+        self.endpoints = [ Endpoint(url) for url in urls ]
+        self.session = session
+        self.timeout = timeout
+        self.batchWindow = batchWindow
+        self.maxBatch = maxBatch
+        self.healthInterval = healthInterval
+        self.maxLag = maxLag
+
+        self.queue = queue.Queue()
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+        self.senders = ThreadPoolExecutor(max_workers=senders, thread_name_prefix='rpc-sender')
+        self.threads = None
+
+    def __str__(self):
+        return f"BatchingProvider<{', '.join(endpoint.url for endpoint in self.endpoints)}>"
+
+    def isConnected(self):
+        try:
+            return 'result' in self.make_request('web3_clientVersion', [])
+        except Exception:
+            return False
+
+    # queue the call; concurrent calls arriving within `batchWindow` share one HTTP request
+    def make_request(self, method, params):
+        self.start()
+
+        item = {'method': method, 'params': params, 'done': threading.Event()}
+        self.queue.put(item)
+        item['done'].wait()
+
+        if 'error' in item:
+            raise item['error']
+
+        return item['response']
+
+    # several calls in one request, bypassing the queue; results come back in call order
+    def batch(self, calls):
+        if not calls:
+            return []
+
+        payload = [
+            {'jsonrpc': '2.0', 'id': index, 'method': method, 'params': params}
+            for index, (method, params) in enumerate(calls)
+        ]
+
+        body = self.post(payload)
+
+        # endpoints without batch support answer with a single error object
+        if isinstance(body, dict):
+            raise ValueError(body.get('error', body))
+
+        replies = {reply.get('id'): reply for reply in body}
+
+        results = []
+        for index in range(len(calls)):
+            reply = replies.get(index, {})
+
+            if 'error' in reply:
+                results.append(ValueError(reply['error']))
+            else:
+                results.append(reply.get('result'))
+
+        return results
+
+    def start(self):
+        if self.threads is not None:
+            return
+
+        with self.lock:
+            if self.threads is None:
+                self.threads = [ threading.Thread(target=self.dispatch, name='rpc-batcher', daemon=True) ]
+
+                # with a single endpoint there is nothing to choose between
+                if len(self.endpoints) > 1:
+                    self.threads.append( threading.Thread(target=self.healthCheck, name='rpc-health', daemon=True) )
+
+                for thread in self.threads:
+                    thread.start()
+
+    # collect queued calls into batches and hand them to the sender pool
+    def dispatch(self):
+        while True:
+            items = [self.queue.get()]
+            deadline = time.monotonic() + self.batchWindow
+
+            while len(items) < self.maxBatch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+
+                try:
+                    items.append(self.queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self.senders.submit(self.send, items)
+
+    def send(self, items):
+        try:
+            requestIds = [ next(self.ids) for item in items ]
+            payload = [
+                {'jsonrpc': '2.0', 'id': requestId, 'method': item['method'], 'params': item['params']}
+                for requestId, item in zip(requestIds, items)
+            ]
+
+            # a lone call goes out as a plain request
+            body = self.post(payload[0] if len(payload) == 1 else payload)
+
+            if isinstance(body, dict):
+                replies = {requestIds[0]: body} if len(items) == 1 else {}
+
+                if not replies:
+                    raise ValueError(body.get('error', body))
+            else:
+                replies = {reply.get('id'): reply for reply in body}
+
+            for requestId, item in zip(requestIds, items):
+                reply = replies.get(requestId)
+
+                if reply is None:
+                    item['error'] = ValueError(f"No response to {item['method']}")
+                else:
+                    item['response'] = reply
+        except Exception as e:
+            for item in items:
+                item.setdefault('error', e)
+        finally:
+            for item in items:
+                item['done'].set()
+
+    # healthy endpoints first, the lead one picked with odds inverse to its latency so load spreads
+    def ranked(self):
+        now = time.monotonic()
+
+        up = [ endpoint for endpoint in self.endpoints if endpoint.downUntil <= now ]
+        up.sort(key=lambda endpoint: endpoint.latency or 0)
+
+        # endpoints never measured sort first and get probed early
+        if len(up) > 1 and up[0].latency is not None:
+            weights = [ 1 / (endpoint.latency + 0.001) for endpoint in up ]
+            lead = random.choices(up, weights=weights)[0]
+
+            up.remove(lead)
+            up.insert(0, lead)
+
+        down = [ endpoint for endpoint in self.endpoints if endpoint.downUntil > now ]
+        down.sort(key=lambda endpoint: endpoint.downUntil)
+
+        return up + down
+
+    # URL the next request most likely goes to
+    def lead(self):
+        return self.ranked()[0].url
+
+    # POST `payload` to the best endpoint, failing over on timeouts, 429s and server errors
+    # a write the node may have received is not posted again to the next endpoint, the error goes to the caller
+    def post(self, payload):
+        error = None
+        write = any( call['method'] in writes for call in (payload if isinstance(payload, list) else [payload]) )
+
+        for endpoint in self.ranked():
+            started = time.monotonic()
+
+            try:
+                response = self.session.post(endpoint.url, json=payload, timeout=self.timeout)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                endpoint.fail()
+                error = e
+                focal.logger.debug("RPC endpoint %s failed: %s", endpoint.url, e)
+
+                if write and maybeDelivered(e):
+                    raise
+
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                retryAfter = response.headers.get('Retry-After')
+                endpoint.fail(float(retryAfter) if retryAfter and retryAfter.isdigit() else None)
+
+                error = requests.HTTPError(f"{response.status_code} from {endpoint.url}", response=response)
+                focal.logger.debug("RPC endpoint %s answered %d", endpoint.url, response.status_code)
+
+                if write and maybeDelivered(error):
+                    raise error
+
+                continue
+
+            response.raise_for_status()
+            endpoint.observe(time.monotonic() - started)
+
+            return response.json()
+
+        raise error
+
+    # probe every endpoint periodically: measures latency, revives failed ones, benches lagging ones
+    def healthCheck(self):
+        while True:
+            time.sleep(self.healthInterval)
+
+            heads = {}
+            for endpoint in self.endpoints:
+                started = time.monotonic()
+
+                try:
+                    response = self.session.post(
+                        endpoint.url,
+                        json={'jsonrpc': '2.0', 'id': 0, 'method': 'eth_blockNumber', 'params': []},
+                        timeout=self.timeout
+                    )
+                    response.raise_for_status()
+
+                    heads[endpoint] = int(response.json()['result'], 16)
+                    endpoint.observe(time.monotonic() - started)
+                except Exception as e:
+                    endpoint.fail()
+                    focal.logger.debug("Health check of %s failed: %s", endpoint.url, e)
+
+            if heads:
+                best = max(heads.values())
+
+                for endpoint, head in heads.items():
+                    if best - head > self.maxLag:
+                        endpoint.fail(self.healthInterval)
+
+#---------------------------------------
+# JSON-RPC shape of a formatted web3 result: hex quantities and hex data
+#---------------------------------------
+def rpcValue(value):
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+
+    if isinstance(value, int):
+        return hex(value)
+
+    if isinstance(value, (bytes, bytearray)):
+        return '0x' + bytes(value).hex()
+
+    if hasattr(value, 'items'):
+        return { key: rpcValue(item) for key, item in value.items() }
+
+    if isinstance(value, (list, tuple)):
+        return [ rpcValue(item) for item in value ]
+
+    return value
+
+#---------------------------------------
+# In-process EVM (eth-tester on py-evm) for dry runs, safe to share between threads
+#---------------------------------------
+class InProcessProvider(EthereumTesterProvider):
+
+    # main init function
+    def __init__(self):
+        super().__init__()
+        # eth-tester is not thread safe, every request runs alone
+        self.lock = threading.RLock()
+        self.web3 = None
+        # sender -> {nonce: raw transaction} sent ahead of a missing nonce, held the way a node's queue holds them
+        self.queued = {}
+
+    def __str__(self):
+        return "InProcessProvider<eth-tester>"
+
+    def make_request(self, method, params):
+        # the stock provider answers a fixed 0x3d, transactions must be signed for the chain id py-evm checks
+        if method == 'eth_chainId':
+            return {'result': hex(self.ethereum_tester.backend.chain.chain_id)}
+
+        with self.lock:
+            if method == 'eth_sendRawTransaction':
+                return self.sendRaw(params[0])
+
+            return super().make_request(method, params)
+
+    # py-evm rejects a nonce ahead of the account, a node queues it until the missing ones arrive; concurrent senders rely on that
+    def sendRaw(self, rawTxn):
+        from eth_account import Account
+        from hexbytes import HexBytes
+        from web3 import Web3
+        import rlp
+
+        raw = HexBytes(rawTxn)
+        sender = Account.recover_transaction(raw)
+        # typed transactions are 0x02 || rlp([chainId, nonce, ...]), legacy ones rlp([nonce, ...])
+        nonce = int.from_bytes(rlp.decode(raw[1:])[1] if raw[0] < 0x80 else rlp.decode(raw)[0], 'big')
+        expected = self.ethereum_tester.get_nonce(sender)
+
+        if nonce > expected:
+            self.queued.setdefault(sender, {})[nonce] = raw.hex()
+            return {'result': Web3.keccak(raw).hex()}
+
+        response = super().make_request('eth_sendRawTransaction', [raw.hex()])
+        queue = self.queued.get(sender, {})
+        nonce += 1
+
+        # the gap is filled, whatever waited behind it goes in order; one that fails is dropped as a node would
+        while 'error' not in response and nonce in queue:
+            try:
+                queuedResponse = super().make_request('eth_sendRawTransaction', [queue.pop(nonce)])
+            except Exception as e:
+                queuedResponse = {'error': str(e)}
+
+            if 'error' in queuedResponse:
+                focal.logger.debug("Queued transaction %d of %s dropped: %s", nonce, sender, queuedResponse['error'])
+                break
+
+            nonce += 1
+
+        return response
+
+    # same contract as BatchingProvider.batch: raw JSON-RPC results in call order, exceptions in place of errors
+    def batch(self, calls):
+        from web3.exceptions import TransactionNotFound
+
+        results = []
+        for method, params in calls:
+            try:
+                results.append( rpcValue(self.web3.manager.request_blocking(method, params)) )
+            except TransactionNotFound:
+                results.append(None)
+            except Exception as e:
+                results.append(e)
+
+        return results
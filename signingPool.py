@@ -0,0 +1,64 @@
+# import python modules
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+# private key of a worker process, set once by the pool initializer
+workerKey = None
+
+def initWorker(privateKey):
+    global workerKey
+    workerKey = privateKey
+
+#---------------------------------------
+# Sign one transaction dict in a worker: (nonce, raw tx, tx hash, error)
+#---------------------------------------
+def signOne(tfrData):
+    from eth_account import Account
+
+    try:
+        signed = Account.sign_transaction(tfrData, workerKey)
+        return tfrData['nonce'], signed.rawTransaction.hex(), signed.hash.hex(), None
+    except Exception as e:
+        return tfrData['nonce'], None, None, repr(e)
+
+#---------------------------------------
+# ECDSA signing and RLP encoding of prepared transactions spread over worker processes
+#---------------------------------------
+class SigningPool:
+
+    # main init function
+    def __init__(self, privateKey, workers = None, chunkSize = 64, minBatch = 128):
+        self.privateKey = privateKey
+        self.workers = workers or os.cpu_count() or 1
+        self.chunkSize = chunkSize
+        # below this many transactions worker start-up costs more than it saves
+        self.minBatch = minBatch
+        self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    # (tfrData, raw tx, tx hash, error) for every transaction, streamed in nonce order
+    def sign(self, txns):
+        txns = sorted(txns, key=lambda tfrData: tfrData['nonce'])
+
+        if len(txns) < self.minBatch or self.workers == 1:
+            initWorker(self.privateKey)
+            signed = map(signOne, txns)
+        else:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=initWorker, initargs=(self.privateKey,))
+
+            # map keeps input order, chunks keep the pickling overhead down
+            signed = self.pool.map(signOne, txns, chunksize=self.chunkSize)
+
+        for tfrData, (nonce, rawTxn, txHash, error) in zip(txns, signed):
+            yield tfrData, rawTxn, txHash, error
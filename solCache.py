@@ -0,0 +1,135 @@
+
+# import python modules
+import os, re, json, hashlib, threading
+
+#---------------------------------------
+# Content-hashed cache for solc artifacts
+#---------------------------------------
+class SolCache:
+
+    # matches `import "x";`, `import {A} from "x";` and `import * as A from "x";`
+    importRe = re.compile(r'^\s*import\s+(?:[^"\';]*?\s+from\s+)?["\']([^"\']+)["\']', re.M)
+
+    # in-process memo shared by every instance: key -> compiler output
+    memo = {}
+    memoLock = threading.Lock()
+
+    # source tree hashes per root file, with the (mtime, size) of every file they were read at
+    trees = {}
+
+    # main init function
+    def __init__(self, basePath = '.', cacheDir = '.solc-cache'):
+        self.basePath = basePath
+        self.cacheDir = cacheDir
+
+    # resolve an import the same way solc does with base path `basePath`
+    def resolveImport(self, importer, target):
+        if target.startswith('.'):
+            path = os.path.join(os.path.dirname(importer), target)
+        else:
+            path = os.path.join(self.basePath, target)
+
+        return os.path.normpath(path)
+
+    @staticmethod
+    def stamp(path):
+        stat = os.stat(path)
+
+        return (stat.st_mtime_ns, stat.st_size)
+
+    # collect the source file and every file it imports, transitively; re-read only when a file changed
+    def sourceTree(self, source):
+        root = os.path.normpath(os.path.join(self.basePath, source))
+
+        with self.memoLock:
+            cached = self.trees.get(root)
+
+        if cached is not None:
+            stamps, seen = cached
+
+            try:
+                if all(self.stamp(path) == stamp for path, stamp in stamps.items()):
+                    return seen
+            except OSError:
+                # a file of the tree is gone, the imports may have changed
+                pass
+
+        seen = {}
+        stamps = {}
+        pending = [root]
+
+        while pending:
+            path = pending.pop()
+            if path in seen:
+                continue
+
+            # stamped before reading, so a write during the read forces a re-hash next time
+            stamps[path] = self.stamp(path)
+
+            with open(path, 'rb') as fp:
+                content = fp.read()
+
+            seen[path] = hashlib.sha256(content).hexdigest()
+
+            for target in self.importRe.findall(content.decode('utf-8', 'replace')):
+                pending.append(self.resolveImport(path, target))
+
+        with self.memoLock:
+            self.trees[root] = (stamps, seen)
+
+        return seen
+
+    # cache key from the source tree, the compiler version and the settings
+    def key(self, source, version, settings):
+        digest = hashlib.sha256()
+        digest.update(str(version).encode())
+        digest.update(json.dumps(settings, sort_keys=True).encode())
+
+        for path, fileHash in sorted(self.sourceTree(source).items()):
+            digest.update(os.path.relpath(path, self.basePath).encode())
+            digest.update(fileHash.encode())
+
+        return digest.hexdigest()
+
+    def artifactPath(self, key):
+        return os.path.join(self.cacheDir, f"{key}.json")
+
+    # return cached compiler output for `key`, or None on a miss
+    def load(self, key):
+        with self.memoLock:
+            if key in self.memo:
+                return self.memo[key]
+
+        path = self.artifactPath(key)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path) as fp:
+                output = json.load(fp)
+        except ValueError:
+            # half-written or corrupt artifact, treat as a miss
+            return None
+
+        with self.memoLock:
+            self.memo[key] = output
+
+        return output
+
+    # persist compiler output atomically so concurrent processes never read a partial file
+    def store(self, key, output):
+        if not os.path.exists(self.cacheDir):
+            os.makedirs(self.cacheDir, exist_ok=True)
+
+        path = self.artifactPath(key)
+        tmpPath = f"{path}.{os.getpid()}.tmp"
+
+        with open(tmpPath, 'w') as fp:
+            json.dump(output, fp)
+
+        os.replace(tmpPath, path)
+
+        with self.memoLock:
+            self.memo[key] = output
+
+        return path
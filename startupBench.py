@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+# --------------------------------------------
+# Start-up time of the lightweight NFTTrade.py commands
+#
+# python3 startupBench.py [-r runs] [-b budget seconds]
+# --------------------------------------------
+
+# import python modules
+import os, sys, json, time, argparse, tempfile, subprocess, statistics
+
+script = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'NFTTrade.py')
+
+# commands that must not load web3, solcx or pinatapy
+commands = {
+  'help': ['--help'],
+  'config': ['-config', 'bench', '-key', 'runs', '-value', '1', '-o', 'off'],
+  'metadata': ['-md', '-tr', 'traits.csv', '-mf', 'manifest.json', '-od', 'metadata', '-o', 'off'],
+}
+
+heavy = ('web3', 'solcx', 'pinatapy', 'Crypto')
+
+#---------------------------------------
+# A small collection for the metadata command
+#---------------------------------------
+def fixtures(workDir):
+  with open(os.path.join(workDir, 'manifest.json'), 'w') as fp:
+    json.dump({f"{tokenId}.png": f"QmBench/{tokenId}.png" for tokenId in range(100)}, fp)
+
+  with open(os.path.join(workDir, 'traits.csv'), 'w') as fp:
+    fp.write("token_id,name,description,image,colour\n")
+
+    for tokenId in range(100):
+      fp.write(f"{tokenId},Bench {tokenId},benchmark,{tokenId}.png,blue\n")
+
+#---------------------------------------
+# Wall time of one run of `args`
+#---------------------------------------
+def timeRun(args, workDir):
+  started = time.perf_counter()
+  subprocess.run([sys.executable, script] + args, cwd=workDir, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+  return time.perf_counter() - started
+
+#---------------------------------------
+# Cumulative import time of the slowest top level modules, and the heavy ones that got loaded
+#---------------------------------------
+def importProfile(args, workDir, top = 10):
+  result = subprocess.run([sys.executable, '-X', 'importtime', script] + args, cwd=workDir, capture_output=True, text=True)
+
+  modules = {}
+  for line in result.stderr.splitlines():
+    if not line.startswith('import time:') or 'cumulative' in line:
+      continue
+
+    selfTime, cumulative, name = line[len('import time:'):].split('|')
+    # top level modules are not indented
+    if not name.startswith('  '):
+      modules[name.strip()] = int(cumulative) / 1e6
+
+  slowest = sorted(modules.items(), key=lambda item: item[1], reverse=True)[:top]
+  loaded = sorted(name for name in modules if name.split('.')[0] in heavy)
+
+  return {'slowest': dict(slowest), 'heavyLoaded': loaded}
+
+def main():
+  parser = argparse.ArgumentParser(description='Start-up time of the lightweight NFTTrade.py commands')
+  parser.add_argument('-r', '--runs', type=int, default=5, help='runs per command')
+  parser.add_argument('-b', '--budget', type=float, default=1.0, help='seconds a median run may take')
+  args = parser.parse_args()
+
+  report = {}
+
+  with tempfile.TemporaryDirectory() as workDir:
+    fixtures(workDir)
+
+    for name, cmd in commands.items():
+      runs = [ timeRun(cmd, workDir) for run in range(args.runs) ]
+
+      report[name] = {
+        'median': round(statistics.median(runs), 3),
+        'min': round(min(runs), 3),
+        'max': round(max(runs), 3),
+        **importProfile(cmd, workDir),
+      }
+
+  print(json.dumps(report, indent=2))
+
+  slow = [ name for name, row in report.items() if row['median'] > args.budget or row['heavyLoaded'] ]
+  if slow:
+    sys.exit(f"Over budget or loading heavy modules: {', '.join(slow)}")
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,13 @@
+# import python modules
+import os, sys
+import pytest
+
+# the modules live at the repository root, next to NFTTrade.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+# the log directory and any index or manifest land in the test's own directory
+@pytest.fixture(autouse=True)
+def workDir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+
+    return tmp_path
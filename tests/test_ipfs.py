@@ -0,0 +1,77 @@
+# import python modules
+import pytest
+
+from ipfsIndex import PinIndex, fileHash, cidV0
+from ipfsPipeline import PinPipeline
+
+#---------------------------------------
+# Pinata stand-in: answers pin_list from `pinned`, uploads with `uploads` in turn
+#---------------------------------------
+class FakePinata:
+
+    def __init__(self, pinned = (), uploads = ()):
+        self.pinned = set(pinned)
+        self.uploads = list(uploads)
+        self.calls = 0
+
+    def pin_list(self, options):
+        return {'count': int(options['hashContains'] in self.pinned)}
+
+    def pin_file_to_ipfs(self, path):
+        self.calls += 1
+
+        return self.uploads.pop(0)
+
+def write(path, data):
+    path.write_bytes(data)
+
+    return str(path)
+
+# CIDs printed by `ipfs add` (go-ipfs defaults, CIDv0)
+@pytest.mark.parametrize('data, cid', [
+    (b'hello world\n', 'QmT78zSuBmuS4z925WZfrqQ1qHaJ56DQaTfyMUF7F8ff5o'),
+    (b'', 'QmbFMke1KXqnYyBBWxB74N4c5SBnJMVAiMNRcGu6x1AwQH'),
+])
+def test_fileHash_matches_ipfs_add(tmp_path, data, cid):
+    multihash, tsize = fileHash(write(tmp_path / 'file', data))
+
+    assert cidV0(multihash) == cid
+
+def test_pinned_returns_cid_and_basename(tmp_path):
+    path = write(tmp_path / 'hello.txt', b'hello world\n')
+    fileCid, wrappedCid = PinIndex.cids(path)
+
+    pipeline = PinPipeline(FakePinata(pinned=[wrappedCid]), index=PinIndex(str(tmp_path / 'index.json')))
+
+    assert pipeline.pinned(path) == (f"{wrappedCid}/hello.txt", None)
+
+    # answered from the index the second time, in the same shape
+    pipeline.pinata.pinned = set()
+    assert pipeline.pinned(path) == (f"{wrappedCid}/hello.txt", None)
+
+def test_bare_file_pin_is_uploaded_again(tmp_path):
+    path = write(tmp_path / 'hello.txt', b'hello world\n')
+    fileCid, wrappedCid = PinIndex.cids(path)
+
+    pinata = FakePinata(pinned=[fileCid], uploads=[{'IpfsHash': wrappedCid}])
+    pipeline = PinPipeline(pinata, index=PinIndex(str(tmp_path / 'index.json')))
+
+    assert pipeline.pinned(path) == (None, (fileCid, wrappedCid))
+    assert pipeline.pinFile(path) == f"{wrappedCid}/hello.txt"
+    assert pinata.calls == 1
+
+def test_upload_fails_fast_on_a_client_error(tmp_path):
+    path = write(tmp_path / 'hello.txt', b'hello world\n')
+    pinata = FakePinata(uploads=[{'status': 401, 'reason': 'Unauthorized'}])
+
+    with pytest.raises(RuntimeError, match='Unauthorized'):
+        PinPipeline(pinata, retries=5, backoff=0).upload(path)
+
+    assert pinata.calls == 1
+
+def test_upload_retries_rate_limits(tmp_path):
+    path = write(tmp_path / 'hello.txt', b'hello world\n')
+    pinata = FakePinata(uploads=[{'status': 429, 'reason': 'Too Many Requests'}, {'status': 500, 'reason': 'oops'}, {'IpfsHash': 'QmX'}])
+
+    assert PinPipeline(pinata, retries=5, backoff=0).upload(path) == 'QmX/hello.txt'
+    assert pinata.calls == 3
@@ -0,0 +1,49 @@
+# import python modules
+import json
+import pytest
+
+from metadataGen import manifestItems, CidMap, MetadataGenerator
+
+manifest = {
+    'a.png': 'QmA/a.png',
+    'dir/b "quoted".png': 'QmB/b "quoted".png',
+    'ünï/cødé\\\\x.png': 'QmC/cødé\\\\x.png',
+    '': 'QmEmpty/',
+}
+
+@pytest.mark.parametrize('chunkSize', [1, 2, 7, 65536])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_manifestItems_reads_what_json_load_reads(workDir, chunkSize, indent):
+    path = workDir / 'manifest.json'
+    path.write_text(json.dumps(manifest, indent=indent), encoding='utf-8')
+
+    assert dict(manifestItems(str(path), chunkSize)) == manifest
+
+@pytest.mark.parametrize('text', ['{"a": "b"', '{"a": 1}', '["a"]', '{"a" "b"}'])
+def test_manifestItems_rejects_other_json(workDir, text):
+    path = workDir / 'manifest.json'
+    path.write_text(text)
+
+    with pytest.raises(ValueError):
+        dict(manifestItems(str(path), 2))
+
+def test_generate_resolves_images_through_the_manifest(workDir):
+    (workDir / 'manifest.json').write_text(json.dumps({'art/1.png': 'QmA/1.png'}))
+    (workDir / 'traits.csv').write_text('token_id,name,image,colour\n1,One,art/1.png,red\n2,Two,art/2.png,blue\n')
+
+    generator = MetadataGenerator('manifest.json', 'out')
+
+    assert generator.generate('traits.csv') == (1, 1)
+    assert json.loads((workDir / 'out' / '1.json').read_text()) == {
+        'attributes': [{'trait_type': 'colour', 'value': 'red'}],
+        'description': '',
+        'image': 'ipfs://QmA/1.png',
+        'name': 'One',
+    }
+
+def test_cidMap_lookups(workDir):
+    (workDir / 'manifest.json').write_text(json.dumps(manifest))
+    cids = CidMap('manifest.json', batchSize=2)
+
+    assert cids.get('dir/b "quoted".png') == 'QmB/b "quoted".png'
+    assert cids.get('missing.png') is None
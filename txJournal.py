@@ -0,0 +1,151 @@
+# import python modules
+import os, json, math, time, atexit, threading
+from contextlib import contextmanager
+
+# pipeline stages in the order a transaction goes through them
+stages = ('compile', 'estimate', 'sign', 'send', 'mined')
+
+#---------------------------------------
+# One operation in the journal, filled in as it moves through the stages
+#---------------------------------------
+class JournalEntry:
+
+    # main init function
+    def __init__(self, journal, op, args):
+        self.journal = journal
+        self.record = {
+            'op': op,
+            'args': list(args),
+            'time': time.time(),
+            # stage -> [start, end], time.monotonic() seconds
+            'stages': {},
+        }
+        self.done = False
+
+    # time the body of the with block as `name`
+    @contextmanager
+    def stage(self, name):
+        start = time.monotonic()
+
+        try:
+            yield self
+        finally:
+            self.mark(name, start)
+
+    def mark(self, name, start, end = None):
+        self.record['stages'][name] = [start, time.monotonic() if end is None else end]
+
+    def update(self, **fields):
+        self.record.update(fields)
+
+    # fill in what a mined receipt tells us
+    def receipt(self, receipt):
+        self.record['status'] = receipt.get('status')
+        self.record['gasUsed'] = receipt.get('gasUsed')
+        self.record['blockNumber'] = receipt.get('blockNumber')
+
+    # append the record to the journal, once
+    def finish(self, **fields):
+        if self.done:
+            return
+
+        self.done = True
+        self.record.update(fields)
+        self.journal.append(self.record)
+
+#---------------------------------------
+# Append-only JSONL journal of transactions with per stage timings
+#---------------------------------------
+class TxJournal:
+
+    # one journal per process
+    shared = None
+    sharedLock = threading.Lock()
+
+    # main init function
+    def __init__(self, path = 'tx-journal.jsonl'):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fp = None
+
+    # process wide journal, configured from the environment on first use
+    @classmethod
+    def get(cls):
+        with cls.sharedLock:
+            if cls.shared is None:
+                cls.shared = cls( os.getenv('TX_JOURNAL', 'tx-journal.jsonl') )
+
+        return cls.shared
+
+    def begin(self, op, args = ()):
+        return JournalEntry(self, op, args)
+
+    def append(self, record):
+        # TX_JOURNAL=off keeps the timings in memory only
+        if self.path == 'off':
+            return
+
+        line = json.dumps(record, default=str)
+
+        with self.lock:
+            if self.fp is None:
+                # line buffered, a crash loses at most the record being written
+                self.fp = open(self.path, 'a', buffering=1)
+                atexit.register(self.close)
+
+            self.fp.write(line + "\n")
+
+    def close(self):
+        with self.lock:
+            if self.fp is not None:
+                self.fp.close()
+                self.fp = None
+
+    # nearest rank percentile of sorted `values`
+    @staticmethod
+    def percentile(values, pct):
+        rank = max(1, math.ceil(pct / 100 * len(values)))
+
+        return values[rank - 1]
+
+    # latency per op and stage of the journal at `path`: {op: {stage: {count, p50, p95, max}}}, in ms
+    @classmethod
+    def report(cls, path, op = None):
+        durations = {}
+
+        with open(path) as fp:
+            for line in fp:
+                line = line.strip()
+                if not line:
+                    continue
+
+                record = json.loads(line)
+                if op and record.get('op') != op:
+                    continue
+
+                recordStages = record.get('stages', {})
+                ops = durations.setdefault(record.get('op'), {})
+
+                for name, (start, end) in recordStages.items():
+                    ops.setdefault(name, []).append((end - start) * 1000)
+
+                # compile to mined, for the operations that went all the way
+                if 'mined' in recordStages:
+                    first = min(start for start, end in recordStages.values())
+                    ops.setdefault('total', []).append((recordStages['mined'][1] - first) * 1000)
+
+        summary = {}
+        for opName, opStages in durations.items():
+            order = [ name for name in stages + ('total',) if name in opStages ] + sorted(set(opStages) - set(stages) - {'total'})
+            summary[opName] = {}
+
+            for name in order:
+                values = sorted(opStages[name])
+                summary[opName][name] = {
+                    'count': len(values),
+                    'p50': round(cls.percentile(values, 50), 2),
+                    'p95': round(cls.percentile(values, 95), 2),
+                    'max': round(values[-1], 2),
+                }
+
+        return summary